@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class FeedConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'feed'
+
+    def ready(self):
+        from PIL import Image
+        from django.conf import settings
+        from . import signals  # noqa: F401
+
+        # Pillow refuse d'ouvrir les images dépassant le double de cette limite (bombes de décompression)
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
@@ -0,0 +1,117 @@
+"""
+Cache des pages du feed par utilisateur.
+
+Chaque page du feed est mise en cache sous la forme de la liste ordonnée de ses clés de posts et du curseur de la
+page suivante. Les entrées d'un utilisateur sont indexées par un numéro de version : l'invalidation du feed d'un
+utilisateur incrémente sa version, rendant obsolètes toutes ses pages en cache.
+
+Une page calculée à partir de la copie de la base de données (voir main.replica) n'est pas mise en cache : lue après
+une invalidation, elle resterait en cache sous la nouvelle version sans les écritures non encore synchronisées.
+
+Les compteurs de succès, d'échecs et d'invalidations sont propres au processus, comme le cache local en mémoire
+utilisé par défaut.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from main.replica import is_reading_replica
+from .pagination import PostKey
+
+FeedPage = tuple[list[PostKey], str | None]
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _count(stat: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[stat] += value
+
+
+def get_stats() -> dict[str, int]:
+    """
+    Retourne les compteurs du cache du feed : succès (hits), échecs (misses) et invalidations
+    (invalidations) de feeds d'utilisateurs
+    """
+    with _stats_lock:
+        return {stat: _stats[stat] for stat in ("hits", "misses", "invalidations")}
+
+
+def _version_key(user_id: int) -> str:
+    return f"feed:version:{user_id}"
+
+
+def _page_key(user_id: int, version: int, cursor: str | None) -> str:
+    cursor_digest = hashlib.md5((cursor or "").encode()).hexdigest()
+    return f"feed:page:{user_id}:{version}:{cursor_digest}"
+
+
+def get_cached_page(user_id: int, cursor: str | None, compute_page: Callable[[], FeedPage]) -> FeedPage:
+    """
+    Retourne une page du feed d'un utilisateur depuis le cache, ou la calcule et la met en cache
+
+    Reçoit l'identifiant de l'utilisateur, le curseur de la page demandée et une fonction calculant la page.
+    """
+    cache = get_cache()
+    # Une version initialisée à partir de l'horloge ne peut pas retrouver des pages d'une version évincée du cache
+    version = cache.get_or_set(_version_key(user_id), time.time_ns, timeout=None)
+    page_key = _page_key(user_id, version, cursor)
+
+    page = cache.get(page_key)
+    if page is not None:
+        _count("hits")
+        return page
+
+    _count("misses")
+    page = compute_page()
+    if not is_reading_replica():
+        cache.set(page_key, page, timeout=settings.FEED_CACHE_TIMEOUT)
+    return page
+
+
+async def aget_cached_page(user_id: int,
+                           cursor: str | None,
+                           compute_page: Callable[[], Awaitable[FeedPage]]) -> FeedPage:
+    """
+    Version asynchrone de get_cached_page, recevant une coroutine calculant la page
+    """
+    cache = get_cache()
+    version = await cache.aget_or_set(_version_key(user_id), time.time_ns, timeout=None)
+    page_key = _page_key(user_id, version, cursor)
+
+    page = await cache.aget(page_key)
+    if page is not None:
+        _count("hits")
+        return page
+
+    _count("misses")
+    page = await compute_page()
+    if not is_reading_replica():
+        await cache.aset(page_key, page, timeout=settings.FEED_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_users(user_ids: Iterable[int]) -> None:
+    """
+    Invalide l'ensemble des pages en cache du feed des utilisateurs
+    """
+    cache = get_cache()
+    for user_id in set(user_ids):
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            # Aucune version en cache : aucune page ne peut être en cache pour cet utilisateur
+            continue
+        _count("invalidations")
@@ -0,0 +1,142 @@
+"""
+Notification en temps réel des nouveaux contenus du feed (Server-Sent Events).
+
+Chaque connexion ouverte sur le flux d'événements d'un utilisateur est abonnée, dans le processus courant, aux
+nouveaux contenus de son feed. À la création d'un ticket ou d'une review, chacun des utilisateurs pouvant le
+visualiser, à l'exception de son auteur, reçoit le nombre de nouveaux contenus publiés depuis le dernier événement :
+la page propose alors de les afficher, sans recharger l'intégralité du feed.
+
+Une connexion inactive ne coûte qu'un abonnement en mémoire et une coroutine en attente, sans fil d'exécution ni
+requête en base de données. Les notifications étant propres au processus, l'application doit être servie par un seul
+processus ASGI pour que chaque utilisateur soit notifié de l'ensemble des contenus.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Iterable
+
+from django.conf import settings
+
+# Délai, en millisecondes, avant la reconnexion du client après la fermeture du flux
+RETRY_DELAY = 5000
+
+
+class Subscription:
+    """
+    Abonnement d'une connexion aux nouveaux contenus du feed d'un utilisateur
+
+    Les nouveaux contenus sont comptés, et non mis en file : un abonnement occupe une mémoire constante quel que soit
+    le nombre de contenus publiés avant sa lecture.
+    """
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.pending = 0
+        self.event = asyncio.Event()
+
+    def notify(self, count: int) -> None:
+        """
+        Ajoute des nouveaux contenus à l'abonnement, exécutée dans la boucle d'événements de la connexion
+        """
+        self.pending += count
+        self.event.set()
+
+    async def wait(self) -> int:
+        """
+        Attend des nouveaux contenus et retourne leur nombre
+        """
+        await self.event.wait()
+        self.event.clear()
+        count, self.pending = self.pending, 0
+        return count
+
+
+class FeedEvents:
+    """
+    Abonnements des connexions ouvertes, par utilisateur
+
+    Les contenus peuvent être publiés depuis n'importe quel fil d'exécution : chaque abonnement est notifié dans la
+    boucle d'événements de sa connexion.
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids: Iterable[int], count: int = 1) -> None:
+        with self._lock:
+            subscriptions = [subscription
+                             for user_id in user_ids
+                             for subscription in self._subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.notify, count)
+            except RuntimeError:
+                # Boucle d'événements fermée : la connexion est terminée
+                continue
+
+    def count(self) -> int:
+        """
+        Retourne le nombre de connexions abonnées
+        """
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+feed_events = FeedEvents()
+
+
+def publish_post(author_id: int, audience: Iterable[int]) -> None:
+    """
+    Notifie les utilisateurs pouvant visualiser un nouveau contenu, à l'exception de son auteur
+    """
+    feed_events.publish(user_id for user_id in audience if user_id != author_id)
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def iter_feed_events(user_id: int) -> AsyncIterator[str]:
+    """
+    Retourne le flux d'événements d'un utilisateur : un événement "new_posts" portant le nombre de nouveaux contenus
+    publiés depuis le précédent événement
+
+    Un commentaire est envoyé toutes les FEED_EVENTS_HEARTBEAT secondes sans nouveau contenu, afin que la connexion ne
+    soit pas fermée par un intermédiaire. Le flux est fermé au bout de FEED_EVENTS_MAX_AGE secondes, le client se
+    reconnectant alors : un abonnement dont le client s'est déconnecté sans que le serveur en soit averti est ainsi
+    libéré.
+    """
+    subscription = feed_events.subscribe(user_id)
+    deadline = time.monotonic() + settings.FEED_EVENTS_MAX_AGE
+    try:
+        yield f"retry: {RETRY_DELAY}\n\n"
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                count = await asyncio.wait_for(subscription.wait(),
+                                               timeout=min(settings.FEED_EVENTS_HEARTBEAT, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event("new_posts", {"count": count})
+    finally:
+        feed_events.unsubscribe(subscription)
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import Textarea, TextInput
+from django.template.defaultfilters import filesizeformat
 from main.forms import DEFAULT_TEXT_INPUT_ATTRS, DEFAULT_TEXT_AREA_ATTRS
 
 from .models import Ticket, Review
@@ -23,6 +26,25 @@ class TicketCreationForm(forms.ModelForm):
             )
         }
 
+    def clean_image(self):
+        """
+        Refuse les images déposées dépassant IMAGE_MAX_UPLOAD_SIZE octets ou IMAGE_MAX_PIXELS pixels
+
+        Les dimensions sont lues dans l'en-tête de l'image lors de sa validation par le champ, sans décoder l'image.
+        """
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(
+                f"L'image ne doit pas dépasser {filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)}")
+        width, height = image.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                f"L'image ne doit pas dépasser {settings.IMAGE_MAX_PIXELS // 1_000_000} millions de pixels "
+                f"({width} x {height})")
+        return image
+
 
 class ReviewCreationForm(forms.ModelForm):
     """
@@ -39,3 +61,14 @@ class ReviewCreationForm(forms.ModelForm):
             "body": Textarea(
                 attrs=DEFAULT_TEXT_AREA_ATTRS,)
         }
+
+
+class SearchForm(forms.Form):
+    """
+    Permet la recherche de tickets et reviews.
+
+    Requiert le texte recherché.
+    """
+    q = forms.CharField(max_length=200,
+                        widget=TextInput(
+                            attrs=DEFAULT_TEXT_INPUT_ATTRS))
@@ -0,0 +1,160 @@
+"""
+Traitement des images des tickets en arrière-plan.
+
+L'enregistrement d'un ticket dont l'image vient d'être déposée marque l'image comme non prête (image_ready) et
+planifie son traitement une fois la transaction validée : l'empreinte de l'image est calculée et ses déclinaisons
+enregistrées (voir feed.renditions). Le traitement est réalisé par un pool de threads (IMAGE_PROCESSING_WORKERS), hors
+du chemin de la requête : le ticket est affiché avec un emplacement réservé jusqu'à ce que l'image soit prête, sa
+version est alors incrémentée afin d'invalider son fragment html en cache.
+
+L'édition d'un ticket sans nouvelle image, ou le dépôt d'une image identique à une image déjà traitée, ne déclenche
+aucun traitement. Les images et déclinaisons que plus aucun ticket n'utilise sont supprimées par la commande
+collect_ticket_images.
+
+Les traitements planifiés sont perdus à l'arrêt du processus : les images restées non prêtes sont traitées par la
+commande recover_ticket_images, à exécuter au démarrage et périodiquement.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import F
+
+from .models import Ticket
+from .renditions import RENDITIONS_DIRECTORY, compute_digest, render_renditions
+from .storage import ticket_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Répertoires et fichiers du stockage adressé par contenu (voir feed.storage)
+CONTENT_DIRECTORY = re.compile(r"[0-9a-f]{2}")
+CONTENT_NAME = re.compile(r"[0-9a-f]{64}\.\w+")
+# Nombre maximal d'empreintes de déclinaisons recherchées par requête
+COLLECT_BATCH_SIZE = 500
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                                       thread_name_prefix="ticket-images")
+    return _executor
+
+
+def process_ticket_image(ticket_id: int) -> None:
+    """
+    Enregistre les déclinaisons de l'image d'un ticket puis la marque comme prête
+
+    Si l'image du ticket a été remplacée pendant le traitement, le ticket n'est pas marqué : le traitement de la
+    nouvelle image est déjà planifié.
+
+    En cas d'échec du traitement, l'image est marquée comme prête sans empreinte : l'image originale est alors
+    affichée, et ses déclinaisons peuvent être enregistrées ultérieurement par la commande rerender_ticket_images.
+    """
+    ticket = Ticket.objects.filter(pk=ticket_id).only('pk', 'image').first()
+    if ticket is None or not ticket.image:
+        return
+    current = Ticket.objects.filter(pk=ticket_id, image=ticket.image.name)
+    try:
+        with ticket.image.open('rb') as image_file:
+            digest = compute_digest(image_file)
+            render_renditions(image_file, digest, default_storage)
+    except Exception:
+        logger.exception("Échec du traitement de l'image du ticket %s, l'image originale est affichée", ticket_id)
+        current.update(image_digest='', image_ready=True, version=F('version') + 1)
+        return
+    current.update(image_digest=digest, image_ready=True, version=F('version') + 1)
+
+
+def run_ticket_image_job(ticket_id: int) -> None:
+    try:
+        process_ticket_image(ticket_id)
+    except Exception:
+        logger.exception("Échec du traitement de l'image du ticket %s", ticket_id)
+    finally:
+        # Les connexions à la base de données sont propres à chaque thread
+        connections.close_all()
+
+
+def schedule_ticket_image(ticket_id: int) -> None:
+    """
+    Planifie le traitement de l'image d'un ticket, en arrière-plan si IMAGE_PROCESSING_ASYNC est vrai
+    """
+    if settings.IMAGE_PROCESSING_ASYNC:
+        get_executor().submit(run_ticket_image_job, ticket_id)
+    else:
+        process_ticket_image(ticket_id)
+
+
+def get_stalled_ticket_images(older_than: float) -> list[int]:
+    """
+    Retourne les identifiants des tickets dont l'image n'est toujours pas prête older_than secondes après son dépôt
+
+    La date de dépôt est la date de modification du fichier de l'image, mise à jour à chaque dépôt (voir
+    feed.storage). Un fichier introuvable ne retarde pas le traitement : celui-ci échoue et l'image est marquée comme
+    prête.
+    """
+    modified_before = time.time() - older_than
+    pending = Ticket.objects.filter(image_ready=False).exclude(image='').exclude(image__isnull=True)
+    stalled = []
+    for ticket_id, name in pending.order_by('pk').values_list('pk', 'image'):
+        try:
+            modified = os.stat(ticket_image_storage.path(name)).st_mtime
+        except FileNotFoundError:
+            modified = 0
+        if modified < modified_before:
+            stalled.append(ticket_id)
+    return stalled
+
+
+def collect_unused_images(grace_period: float) -> tuple[int, int]:
+    """
+    Supprime les images qu'aucun ticket n'utilise et qui n'ont pas été réutilisées depuis grace_period secondes, puis
+    les déclinaisons qu'aucun ticket n'utilise et dont l'image originale a été supprimée
+
+    Retourne le nombre d'images et de déclinaisons d'images supprimées. Les images enregistrées avant le stockage
+    adressé par contenu ne sont pas supprimées, leurs déclinaisons le sont lorsque plus aucun ticket ne les utilise.
+    """
+    modified_before = time.time() - grace_period
+    upload_to = Ticket._meta.get_field('image').upload_to
+
+    deleted_images = 0
+    stored_digests = set()
+    directories = ticket_image_storage.listdir(upload_to)[0] if ticket_image_storage.exists(upload_to) else []
+    for directory in filter(CONTENT_DIRECTORY.fullmatch, directories):
+        names = [f"{upload_to}/{directory}/{filename}"
+                 for filename in ticket_image_storage.listdir(f"{upload_to}/{directory}")[1]
+                 if CONTENT_NAME.fullmatch(filename)]
+        used = set(Ticket.objects.filter(image__in=names).values_list('image', flat=True))
+        for name in names:
+            if name not in used and ticket_image_storage.delete_if_unmodified(name, modified_before):
+                deleted_images += 1
+            else:
+                stored_digests.add(posixpath.splitext(posixpath.basename(name))[0])
+
+    deleted_renditions = 0
+    digests = default_storage.listdir(RENDITIONS_DIRECTORY)[0] if default_storage.exists(RENDITIONS_DIRECTORY) else []
+    digests = [digest for digest in digests if digest not in stored_digests]
+    for start in range(0, len(digests), COLLECT_BATCH_SIZE):
+        batch = digests[start:start + COLLECT_BATCH_SIZE]
+        used = set(Ticket.objects.filter(image_digest__in=batch).values_list('image_digest', flat=True))
+        for digest in batch:
+            directory = f"{RENDITIONS_DIRECTORY}/{digest}"
+            # Déclinaisons en cours d'enregistrement, avant que le ticket ne référence leur empreinte
+            if digest in used or os.stat(default_storage.path(directory)).st_mtime >= modified_before:
+                continue
+            for filename in default_storage.listdir(directory)[1]:
+                default_storage.delete(f"{directory}/{filename}")
+            default_storage.delete(directory)
+            deleted_renditions += 1
+    return deleted_images, deleted_renditions
@@ -0,0 +1,117 @@
+"""
+Chargement des posts affichés dans le feed.
+
+Le nombre de requêtes exécutées pour charger et afficher une page du feed est constant, quel que soit le nombre de
+posts de la page : les auteurs et tickets sont joints aux posts, et l'indicateur "answered" est calculé en base.
+
+Chaque post est également annoté de la relation de l'utilisateur au post, qui avec la version du post identifie son
+fragment html en cache.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from django.contrib.auth.models import User
+from django.db.models import BooleanField, CharField, Exists, OuterRef, QuerySet, Value
+
+from .models import Ticket, Review
+from .pagination import PostKey, TICKET, REVIEW, alist
+
+
+def get_tickets_for_feed(ticket_ids: list[int], user: User, answered: bool = False) -> QuerySet:
+    """
+    Retourne les tickets demandés, avec leur auteur, annotés du type de contenu et de l'indicateur "answered" : vrai
+    si l'utilisateur a déjà répondu au ticket, ou pour tous les tickets si answered est vrai.
+    """
+    if answered:
+        answered_annotation = Value(True, BooleanField())
+    else:
+        answered_annotation = Exists(Review.objects.filter(ticket=OuterRef('pk'), user=user))
+
+    return Ticket.objects.filter(pk__in=ticket_ids).select_related('user').annotate(
+        content_type=Value(TICKET, CharField()),
+        answered=answered_annotation)
+
+
+def get_reviews_for_feed(review_ids: list[int], user: User, answered: bool = False) -> QuerySet:
+    """
+    Retourne les reviews demandées, avec leur auteur, leur ticket et l'auteur du ticket, annotées du type de contenu
+    et de l'indicateur "answered" : vrai si l'utilisateur a déjà répondu au ticket de la review (ce qui inclut ses
+    propres reviews), ou pour toutes les reviews si answered est vrai.
+    """
+    if answered:
+        answered_annotation = Value(True, BooleanField())
+    else:
+        answered_annotation = Exists(Review.objects.filter(ticket=OuterRef('ticket'), user=user))
+
+    return Review.objects.filter(pk__in=review_ids).select_related('user', 'ticket', 'ticket__user').annotate(
+        content_type=Value(REVIEW, CharField()),
+        answered=answered_annotation)
+
+
+def load_posts(keys: list[PostKey], user: User, answered: bool = False) -> list[Ticket | Review]:
+    """
+    Retourne les posts correspondant à une page de clés, dans l'ordre de la page
+
+    Reçoit les clés d'une page du feed et l'utilisateur authentifié :
+        Récupère en une requête les tickets de la page, en une requête les reviews de la page
+    """
+    ticket_ids, review_ids = get_page_ids(keys)
+
+    posts = {}
+    if ticket_ids:
+        posts.update(((TICKET, post.pk), post) for post in get_tickets_for_feed(ticket_ids, user, answered))
+    if review_ids:
+        posts.update(((REVIEW, post.pk), post) for post in get_reviews_for_feed(review_ids, user, answered))
+
+    return order_page(keys, posts, user)
+
+
+async def aload_posts(keys: list[PostKey], user: User, answered: bool = False) -> list[Ticket | Review]:
+    """
+    Version asynchrone de load_posts : les tickets et les reviews de la page sont lus simultanément.
+    """
+    ticket_ids, review_ids = get_page_ids(keys)
+
+    queries = []
+    if ticket_ids:
+        queries.append(alist(get_tickets_for_feed(ticket_ids, user, answered)))
+    if review_ids:
+        queries.append(alist(get_reviews_for_feed(review_ids, user, answered)))
+    posts = {(post.content_type, post.pk): post for result in await asyncio.gather(*queries) for post in result}
+
+    return order_page(keys, posts, user)
+
+
+def get_page_ids(keys: list[PostKey]) -> tuple[list[int], list[int]]:
+    """
+    Retourne les identifiants des tickets et ceux des reviews d'une page de clés
+    """
+    return ([pk for _, content_type, pk in keys if content_type == TICKET],
+            [pk for _, content_type, pk in keys if content_type == REVIEW])
+
+
+def order_page(keys: list[PostKey],
+               posts: dict[tuple[str, int], Ticket | Review],
+               user: User) -> list[Ticket | Review]:
+    """
+    Retourne les posts chargés dans l'ordre de la page, annotés de la relation de l'utilisateur au post
+
+    Les posts supprimés entre la lecture des clés et celle des contenus sont ignorés.
+    """
+    page = [posts[content_type, pk] for _, content_type, pk in keys if (content_type, pk) in posts]
+    for post in page:
+        post.viewer_relation = get_viewer_relation(post, user)
+    return page
+
+
+def get_viewer_relation(post: Ticket | Review, user: User) -> str:
+    """
+    Résume la relation entre l'utilisateur et un post : auteur du post, auteur du ticket concerné, réponse déjà
+    apportée au ticket.
+
+    Seuls ces éléments font varier l'affichage d'un post d'un utilisateur à l'autre : le fragment html d'un post mis
+    en cache est partagé entre tous les utilisateurs ayant la même relation au post.
+    """
+    ticket = post if post.content_type == TICKET else post.ticket
+    return f"{post.user_id == user.pk:d}{ticket.user_id == user.pk:d}{post.answered:d}"
@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import (setup_databases, setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from django.urls import clear_url_caches
+
+from feed.models import Review, Ticket
+from users.models import UserFollows
+
+PATHS = ("/home/", "/posts/", "/follow/")
+
+
+def reload_urls() -> None:
+    """
+    Recharge les urls, dont les vues dépendent de settings.ASYNC_VIEWS
+    """
+    for module in ("feed.urls", "users.urls", settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
+
+
+def create_data(users: int, posts: int, follows: int, seed: int) -> list[User]:
+    rng = random.Random(seed)
+    authors = User.objects.bulk_create([User(username=f"bench{index}") for index in range(users)])
+    UserFollows.objects.bulk_create([
+        UserFollows(user=user, followed_user=followed)
+        for user in authors
+        for followed in rng.sample([other for other in authors if other != user], min(follows, users - 1))])
+
+    tickets = Ticket.objects.bulk_create([
+        Ticket(title=f"Livre {index}", description="description " * 20, user=rng.choice(authors))
+        for index in range(users * posts)])
+    Review.objects.bulk_create([
+        Review(ticket=ticket, rating=rng.randint(0, 5), headline=f"Critique {index}", body="critique " * 20,
+               user=rng.choice(authors))
+        for index, ticket in enumerate(rng.sample(tickets, len(tickets) // 2))])
+    return authors
+
+
+def run_wsgi(clients: list[Client], duration: float) -> int:
+    """
+    Enchaîne les requêtes depuis un fil d'exécution par client, comme les fils d'un serveur WSGI
+    """
+    deadline = time.perf_counter() + duration
+
+    def send(client: Client) -> int:
+        sent = 0
+        while time.perf_counter() < deadline:
+            for path in PATHS:
+                assert client.get(path).status_code == 200, path
+                sent += 1
+        return sent
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        return sum(executor.map(send, clients))
+
+
+async def run_asgi(clients: list[AsyncClient], duration: float) -> int:
+    """
+    Enchaîne les requêtes concurrentes de l'ensemble des clients sur une même boucle d'événements, comme un processus
+    d'un serveur ASGI (uvicorn)
+    """
+    deadline = time.perf_counter() + duration
+
+    async def send(client: AsyncClient) -> int:
+        sent = 0
+        while time.perf_counter() < deadline:
+            for path in PATHS:
+                assert (await client.get(path)).status_code == 200, path
+                sent += 1
+        return sent
+
+    return sum(await asyncio.gather(*(send(client) for client in clients)))
+
+
+class Command(BaseCommand):
+    """
+    Mesure le débit des pages de lecture (flux, contenus de l'utilisateur, abonnements) servies en WSGI avec les vues
+    synchrones, puis en ASGI avec les vues synchrones et avec les vues asynchrones (settings.ASYNC_VIEWS).
+
+    Les requêtes sont traitées dans le processus courant, sans serveur ni réseau, sur une base de test créée pour
+    l'occasion et supprimée à la fin de la mesure.
+    """
+    help = "Benchmark des pages de lecture servies en WSGI et en ASGI, avec les vues synchrones et asynchrones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help="Nombre d'utilisateurs")
+        parser.add_argument('--posts', type=int, default=20, help="Nombre de tickets par utilisateur")
+        parser.add_argument('--follows', type=int, default=20, help="Nombre d'abonnements par utilisateur")
+        parser.add_argument('--concurrency', type=int, default=8, help="Nombre de clients simultanés")
+        parser.add_argument('--duration', type=float, default=5.0, help="Durée de chaque mesure, en secondes")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, users: int, posts: int, follows: int, concurrency: int, duration: float, seed: int,
+               **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+        # Les lectures sont faites sur la base de test, et non sur la copie de la base du projet
+        with override_settings(REPLICA_READ_VIEWS=()):
+            try:
+                authors = create_data(users, posts, follows, seed)
+                self.stdout.write(f"{users} utilisateurs, {Ticket.objects.count()} tickets, "
+                                  f"{Review.objects.count()} reviews, {concurrency} clients simultanés")
+                scenarios = [
+                    ("WSGI, vues synchrones", False, Client),
+                    ("ASGI, vues synchrones", False, AsyncClient),
+                    ("ASGI, vues asynchrones", True, AsyncClient),
+                ]
+                for label, async_views, client_class in scenarios:
+                    with override_settings(ASYNC_VIEWS=async_views):
+                        reload_urls()
+                        clients = [client_class() for _ in range(concurrency)]
+                        for client, author in zip(clients, random.Random(seed).sample(authors, concurrency)):
+                            client.force_login(author)
+                        if client_class is Client:
+                            sent = run_wsgi(clients, duration)
+                        else:
+                            sent = asyncio.run(run_asgi(clients, duration))
+                    self.stdout.write(f"{label:<23} : {sent / duration:7.1f} requêtes/s, "
+                                      f"{duration * concurrency / sent * 1000:6.1f} ms par requête")
+            finally:
+                reload_urls()
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
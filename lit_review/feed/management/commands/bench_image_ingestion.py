@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from PIL import Image
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from feed.forms import TicketCreationForm
+from feed.renditions import compute_digest, render_renditions
+
+# (format, extension, largeur, hauteur) des images synthétiques déposées
+CASES = [
+    ("JPEG", "jpg", 2000, 1500),
+    ("JPEG", "jpg", 6000, 4000),
+    ("JPEG", "jpg", 6000, 6000),
+    ("JPEG", "jpg", 12000, 8400),
+    ("PNG", "png", 2000, 1500),
+    ("PNG", "png", 6000, 4000),
+    ("PNG", "png", 6000, 6000),
+    ("PNG", "png", 12000, 8400),
+]
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def get_max_rss() -> int:
+    """
+    Retourne le pic de mémoire résidente du processus courant, en octets
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def create_image(path: str, pil_format: str, width: int, height: int) -> None:
+    # Un dégradé plutôt qu'une couleur unie, pour une taille de fichier réaliste
+    gradient = Image.linear_gradient("L").resize((width, height))
+    Image.merge("RGB", (gradient, gradient.transpose(Image.Transpose.ROTATE_180), gradient)).save(path, pil_format)
+
+
+def ingest(path: str, media_root: str, results) -> None:
+    """
+    Dépose une image comme le ferait une requête (fichier temporaire, validation du formulaire) puis enregistre ses
+    déclinaisons, et transmet la durée, le résultat et le pic de mémoire au-delà de celui du processus au démarrage
+    """
+    baseline = get_max_rss()
+    start = time.perf_counter()
+    upload = TemporaryUploadedFile(os.path.basename(path), "application/octet-stream", os.path.getsize(path), None)
+    with open(path, "rb") as source:
+        while chunk := source.read(COPY_CHUNK_SIZE):
+            upload.write(chunk)
+    upload.seek(0)
+
+    form = TicketCreationForm(data={"title": "bench", "description": ""}, files={"image": upload})
+    if form.is_valid():
+        outcome = f"{len(render_renditions(upload, compute_digest(upload), FileSystemStorage(media_root)))} renditions"
+    else:
+        outcome = "refusée : " + " ".join(form.errors.get("image", []))
+    upload.close()
+    results.put((time.perf_counter() - start, outcome, max(get_max_rss() - baseline, 0)))
+
+
+class Command(BaseCommand):
+    """
+    Mesure, pour des images synthétiques de tailles croissantes, la durée et le pic de mémoire résidente (ru_maxrss)
+    du dépôt d'une image : validation par TicketCreationForm puis enregistrement de ses déclinaisons.
+
+    Chaque dépôt est réalisé dans un processus distinct, le pic de mémoire mesuré est donc propre à ce dépôt.
+    """
+    help = "Benchmark de la mémoire et de la durée du dépôt d'images de tailles croissantes"
+
+    def handle(self, *args, **options):
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as directory:
+            for pil_format, extension, width, height in CASES:
+                path = os.path.join(directory, f"{width}x{height}.{extension}")
+                # L'image est créée dans un processus distinct, afin de ne pas fausser les mesures suivantes
+                creator = context.Process(target=create_image, args=(path, pil_format, width, height))
+                creator.start()
+                creator.join()
+
+                results = context.Queue()
+                worker = context.Process(target=ingest, args=(path, os.path.join(directory, "media"), results))
+                worker.start()
+                elapsed, outcome, peak = results.get()
+                worker.join()
+                os.remove(path)
+
+                megapixels = width * height / 1_000_000
+                self.stdout.write(f"{pil_format:<4} {width:>5} x {height:<5} ({megapixels:3.0f} Mpx) : "
+                                  f"{elapsed * 1000:7.0f} ms, pic mémoire +{peak / 1024 / 1024:6.1f} Mo, {outcome}")
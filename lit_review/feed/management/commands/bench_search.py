@@ -0,0 +1,67 @@
+import random
+from itertools import accumulate
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from feed.search import CREATE_SEARCH_TABLE, SEARCH_TABLE, TITLE_WEIGHT, BODY_WEIGHT, build_match_query
+
+
+class Command(BaseCommand):
+    """
+    Mesure les performances de l'index FTS5 sur un corpus synthétique, dans une base SQLite temporaire distincte de
+    celle du projet.
+
+    Mesure le débit d'indexation puis la latence des recherches classées par bm25 (p50, p99).
+    """
+    help = "Benchmark de la recherche plein texte sur un corpus synthétique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Nombre de posts du corpus")
+        parser.add_argument('--queries', type=int, default=500, help="Nombre de recherches mesurées")
+        parser.add_argument('--vocabulary', type=int, default=50_000, help="Nombre de mots distincts du corpus")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, rows: int, queries: int, vocabulary: int, seed: int, **options):
+        rng = random.Random(seed)
+        words = [f"mot{index}" for index in range(vocabulary)]
+        # Distribution de Zipf approchée : quelques mots très fréquents, une longue traîne de mots rares
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(Path(directory) / "bench_search.sqlite3")
+            connection.execute(CREATE_SEARCH_TABLE)
+
+            start = time.perf_counter()
+            batch_size = 10_000
+            for batch_start in range(0, rows, batch_size):
+                batch = [
+                    (rowid,
+                     " ".join(rng.choices(words, cum_weights=cum_weights, k=6)),
+                     " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(20, 200))))
+                    for rowid in range(batch_start, min(batch_start + batch_size, rows))]
+                connection.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (?, ?, ?)", batch)
+                connection.commit()
+            indexing_time = time.perf_counter() - start
+            self.stdout.write(f"Indexation : {rows} posts en {indexing_time:.1f} s "
+                              f"({rows / indexing_time:.0f} posts/s)")
+
+            latencies = []
+            for _ in range(queries):
+                text = " ".join(rng.choices(words[:vocabulary // 10], k=rng.randint(1, 3)))
+                start = time.perf_counter()
+                connection.execute(
+                    f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ? "
+                    f"ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) LIMIT 50",
+                    [build_match_query(text)]).fetchall()
+                latencies.append((time.perf_counter() - start) * 1000)
+            connection.close()
+
+        latencies.sort()
+        self.stdout.write(f"Recherche : p50 {statistics.median(latencies):.2f} ms, "
+                          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms, "
+                          f"max {latencies[-1]:.2f} ms")
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from feed.query_plans import explain, find_full_scans, get_checked_querysets
+
+
+class Command(BaseCommand):
+    """
+    Contrôle qu'aucune requête du feed et des abonnements ne parcourt intégralement une table.
+
+    La commande échoue en listant les requêtes concernées et leur plan d'exécution.
+    """
+    help = "Vérifie à l'aide d'EXPLAIN QUERY PLAN que les requêtes du feed et des abonnements sont indexées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Utilisateur pour lequel les requêtes sont construites")
+
+    def handle(self, *args, username: str | None = None, **options):
+        user = User.objects.get(username=username) if username else User(pk=1, username="plan")
+        failures = []
+        for name, queryset in get_checked_querysets(user).items():
+            full_scans = find_full_scans(queryset)
+            if full_scans:
+                failures.append(name)
+                self.stderr.write(f"{name} : parcours complet de table")
+                for step in explain(queryset):
+                    self.stderr.write(f"    {step}")
+            elif options['verbosity'] > 1:
+                self.stdout.write(f"{name} : {' / '.join(explain(queryset))}")
+
+        if failures:
+            raise CommandError(f"Requêtes non indexées : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes du feed et des abonnements sont indexées"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from feed.images import collect_unused_images
+
+
+class Command(BaseCommand):
+    """
+    Supprime les images des tickets qu'aucun ticket n'utilise, et les déclinaisons de ces images.
+
+    Une image n'est supprimée que si elle n'a été ni déposée ni réutilisée depuis le délai de grâce : un ticket en
+    cours d'enregistrement peut réutiliser une image avant de la référencer en base. Le délai doit donc rester
+    supérieur à la durée maximale d'une requête.
+    """
+    help = "Supprime les images et déclinaisons d'images qu'aucun ticket n'utilise"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-period', type=float, default=3600,
+                            help="Délai, en secondes, depuis le dépôt ou la réutilisation d'une image avant sa "
+                                 "suppression")
+
+    def handle(self, *args, grace_period: float, **options):
+        deleted_images, deleted_renditions = collect_unused_images(grace_period)
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted_images} images et {deleted_renditions} déclinaisons d'images supprimées"))
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from feed.timeline import rebuild_user_timeline
+from feed.views import get_users_viewable_tickets, get_users_viewable_reviews
+
+
+class Command(BaseCommand):
+    """
+    Reconstruit le timeline matérialisé (FeedEntry) de l'ensemble des utilisateurs à partir des contenus existants.
+
+    Les utilisateurs sont traités par lots, chaque lot étant reconstruit dans sa propre transaction.
+    """
+    help = "Reconstruit par lots le timeline matérialisé de tous les utilisateurs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Nombre d'utilisateurs reconstruits par transaction")
+
+    def handle(self, *args, batch_size: int, **options):
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        total_entries = 0
+        for start in range(0, len(user_ids), batch_size):
+            with transaction.atomic():
+                for user in User.objects.filter(pk__in=user_ids[start:start + batch_size]):
+                    total_entries += rebuild_user_timeline(
+                        user, get_users_viewable_tickets(user), get_users_viewable_reviews(user))
+            self.stdout.write(f"{min(start + batch_size, len(user_ids))}/{len(user_ids)} utilisateurs traités")
+        self.stdout.write(self.style.SUCCESS(f"Timeline reconstruit : {total_entries} entrées"))
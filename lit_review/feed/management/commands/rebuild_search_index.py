@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from feed.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Reconstruit intégralement l'index de recherche plein texte (table FTS5 feed_search) à partir des tickets et
+    reviews existants.
+    """
+    help = "Reconstruit l'index de recherche plein texte des tickets et reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Alias de la base de données à réindexer")
+
+    def handle(self, *args, database: str, **options):
+        with transaction.atomic(using=database):
+            rebuild_index(using=database)
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit"))
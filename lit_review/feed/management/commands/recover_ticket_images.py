@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from feed.images import get_stalled_ticket_images, process_ticket_image
+
+
+class Command(BaseCommand):
+    """
+    Traite les images des tickets restées non prêtes, dont le traitement en arrière-plan a été perdu à l'arrêt du
+    processus qui l'avait planifié.
+
+    Seules les images déposées depuis plus longtemps que le délai sont traitées : un traitement plus récent peut être
+    encore en cours. Le délai doit donc rester supérieur à la durée maximale d'un traitement.
+    """
+    help = "Traite les images des tickets dont le traitement en arrière-plan a été perdu"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=600,
+                            help="Délai, en secondes, depuis le dépôt d'une image non prête avant son traitement")
+
+    def handle(self, *args, older_than: float, **options):
+        stalled = get_stalled_ticket_images(older_than)
+        for ticket_id in stalled:
+            process_ticket_image(ticket_id)
+        self.stdout.write(self.style.SUCCESS(f"{len(stalled)} images de tickets traitées"))
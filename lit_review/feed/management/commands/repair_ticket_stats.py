@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from feed.models import Ticket, Review
+
+
+class Command(BaseCommand):
+    """
+    Recalcule les statistiques dénormalisées des reviews (review_count, rating_sum) de l'ensemble des tickets.
+
+    Les tickets sont mis à jour par tranches de clés primaires, chaque tranche en une seule requête UPDATE.
+    """
+    help = "Recalcule en masse le nombre de reviews et la somme des notes de chaque ticket"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="Nombre de clés primaires de tickets mises à jour par requête")
+
+    def handle(self, *args, batch_size: int, **options):
+        reviews = Review.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+        review_count = Subquery(reviews.annotate(count=Count('pk')).values('count'))
+        rating_sum = Subquery(reviews.annotate(total=Sum('rating')).values('total'))
+
+        last_pk = Ticket.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        updated = 0
+        for start in range(0, last_pk + 1, batch_size):
+            with transaction.atomic():
+                updated += Ticket.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                    review_count=Coalesce(review_count, Value(0)),
+                    rating_sum=Coalesce(rating_sum, Value(0)),
+                    version=F('version') + 1)
+        self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {updated} tickets"))
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F
+from django.utils.dateparse import parse_date
+
+from feed.models import Ticket
+from feed.renditions import compute_digest, get_rendition_names, render_renditions
+from feed.storage import ticket_image_storage
+
+DEFAULT_CHECKPOINT = os.path.join(settings.BASE_DIR, "rerender_ticket_images.checkpoint")
+
+
+def parse_since(value: str):
+    since = parse_date(value)
+    if since is None:
+        raise argparse.ArgumentTypeError(f"Date invalide : {value}, format attendu AAAA-MM-JJ")
+    return since
+
+
+def is_up_to_date(digest: str) -> bool:
+    """
+    Indique si l'ensemble des déclinaisons actuellement configurées d'une image existent
+    """
+    return bool(digest) and all(default_storage.exists(name) for name in get_rendition_names(digest))
+
+
+def rerender_image(job: tuple[int, str, str, bool]) -> tuple[int, str, int, int, str | None]:
+    """
+    Enregistre les déclinaisons manquantes (ou toutes si force est vrai) de l'image d'un ticket
+
+    Exécutée dans un processus du pool, sans accès à la base de données. Retourne l'identifiant du ticket, l'empreinte
+    de l'image, le nombre de déclinaisons écrites, la taille de l'image lue et l'éventuelle erreur rencontrée.
+    """
+    ticket_id, name, digest, force = job
+    if not force and is_up_to_date(digest):
+        return ticket_id, digest, 0, 0, None
+    try:
+        with ticket_image_storage.open(name, 'rb') as image_file:
+            digest = compute_digest(image_file)
+            if force:
+                for rendition_name in get_rendition_names(digest):
+                    default_storage.delete(rendition_name)
+            written = render_renditions(image_file, digest, default_storage)
+        return ticket_id, digest, len(written), ticket_image_storage.size(name), None
+    except Exception as error:
+        return ticket_id, digest, 0, 0, f"{type(error).__name__}: {error}"
+
+
+class Command(BaseCommand):
+    """
+    Enregistre les déclinaisons manquantes des images de l'ensemble des tickets, par exemple après une modification
+    de IMAGE_RENDITIONS ou IMAGE_RENDITION_FORMATS.
+
+    Les tickets sont parcourus par clé primaire croissante et leurs images réparties entre les processus d'un pool.
+    La dernière clé primaire traitée est enregistrée régulièrement dans un fichier de reprise : une exécution
+    interrompue reprend là où elle s'était arrêtée. Les images dont toutes les déclinaisons existent sont ignorées.
+    """
+    help = "Régénère les déclinaisons manquantes des images des tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_since, default=None,
+                            help="Ne traite que les tickets créés depuis cette date (AAAA-MM-JJ)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Nombre de processus (nombre de cœurs par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=16, help="Nombre d'images transmises par tâche")
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="Fichier de reprise")
+        parser.add_argument('--checkpoint-every', type=int, default=200,
+                            help="Nombre d'images traitées entre deux enregistrements du fichier de reprise")
+        parser.add_argument('--restart', action='store_true', help="Ignore le fichier de reprise existant")
+        parser.add_argument('--force', action='store_true',
+                            help="Réécrit toutes les déclinaisons, par exemple après un changement des options "
+                                 "d'encodage")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Affiche le nombre d'images à traiter sans rien écrire")
+
+    def read_checkpoint(self, path: str, since) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get("since") != (since.isoformat() if since else None):
+            raise CommandError(f"Le fichier de reprise {path} a été créé avec un autre --since, "
+                               f"utilisez --restart pour l'ignorer")
+        return checkpoint["last_pk"]
+
+    def write_checkpoint(self, path: str, since, last_pk: int) -> None:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump({"since": since.isoformat() if since else None, "last_pk": last_pk}, checkpoint_file)
+        os.replace(temporary_path, path)
+
+    def handle(self, *args, since, workers: int, chunk_size: int, checkpoint: str, checkpoint_every: int,
+               restart: bool, force: bool, dry_run: bool, **options):
+        last_pk = 0 if restart or dry_run else self.read_checkpoint(checkpoint, since)
+        tickets = Ticket.objects.exclude(image='').exclude(image__isnull=True).filter(pk__gt=last_pk)
+        if since is not None:
+            tickets = tickets.filter(time_created__date__gte=since)
+        jobs = [(pk, image, digest, force)
+                for pk, image, digest in tickets.order_by('pk').values_list('pk', 'image', 'image_digest')]
+        if last_pk:
+            self.stdout.write(f"Reprise après le ticket {last_pk}")
+
+        if dry_run:
+            pending = len(jobs) if force else sum(not is_up_to_date(digest) for _, _, digest, _ in jobs)
+            self.stdout.write(f"{pending} images sur {len(jobs)} seraient traitées")
+            return
+
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus du pool
+        connections.close_all()
+        start = time.perf_counter()
+        processed = rendered = skipped = read_bytes = 0
+        errors = []
+        images = {ticket_id: name for ticket_id, name, _, _ in jobs}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for ticket_id, digest, written, size, error in executor.map(rerender_image, jobs, chunksize=chunk_size):
+                # Les tickets dont l'image a été remplacée entre-temps ne sont pas mis à jour
+                current = Ticket.objects.filter(pk=ticket_id, image=images[ticket_id])
+                processed += 1
+                if error:
+                    errors.append((ticket_id, error))
+                elif written:
+                    rendered += 1
+                    read_bytes += size
+                    current.update(image_digest=digest, image_ready=True, version=F('version') + 1)
+                else:
+                    skipped += 1
+                    # Image traitée avant l'introduction des déclinaisons, dont les déclinaisons existaient déjà
+                    current.filter(image_digest='').update(
+                        image_digest=digest, image_ready=True, version=F('version') + 1)
+
+                if processed % checkpoint_every == 0:
+                    self.write_checkpoint(checkpoint, since, ticket_id)
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(f"{processed}/{len(jobs)} images, {processed / elapsed:.1f} images/s")
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        for ticket_id, error in errors:
+            self.stderr.write(f"Ticket {ticket_id} : {error}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} images en {elapsed:.1f} s ({processed / elapsed if elapsed else 0:.1f} images/s, "
+            f"{read_bytes / 1024 / 1024 / elapsed if elapsed else 0:.1f} Mo/s) : {rendered} régénérées, "
+            f"{skipped} à jour, {len(errors)} en erreur"))
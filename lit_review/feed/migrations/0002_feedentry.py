@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feed', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('TICKET', 'Ticket'), ('REVIEW', 'Review')], max_length=6)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('time_created', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries',
+                                            to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['owner', '-time_created', '-content_type', '-object_id'],
+                                 name='feed_entry_timeline_idx'),
+                    models.Index(fields=['content_type', 'object_id'], name='feed_entry_object_idx'),
+                ],
+                'unique_together': {('owner', 'content_type', 'object_id')},
+            },
+        ),
+    ]
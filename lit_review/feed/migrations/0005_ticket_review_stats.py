@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_review_stats(apps, schema_editor):
+    Ticket = apps.get_model('feed', 'Ticket')
+    Review = apps.get_model('feed', 'Review')
+    reviews = Review.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+    Ticket.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), Value(0)),
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_review_stats, migrations.RunPython.noop),
+    ]
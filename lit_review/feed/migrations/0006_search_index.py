@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 05:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0005_ticket_review_stats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE feed_search USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')",
+                "INSERT INTO feed_search (rowid, title, body) SELECT 2 * id, title, description FROM feed_ticket",
+                "INSERT INTO feed_search (rowid, title, body) SELECT 2 * id + 1, headline, body FROM feed_review",
+            ],
+            reverse_sql="DROP TABLE feed_search",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='image_ready',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0007_ticket_image_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='image_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:56
+
+from django.db import migrations, models
+import feed.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0008_ticket_image_digest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=feed.storage.ContentAddressedStorage(),
+                                    upload_to='user_images'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['image'], name='ticket_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['image_digest'], name='ticket_image_digest_idx'),
+        ),
+    ]
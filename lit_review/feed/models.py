@@ -1,9 +1,13 @@
-from PIL import Image
+from __future__ import annotations
+
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
 
-IMAGE_MAX_SIZE = (200, 200)
+from .pagination import TICKET, REVIEW
+from .renditions import get_rendition_urls
+from .storage import ticket_image_storage
 
 
 class Ticket(models.Model):
@@ -13,18 +17,87 @@ class Ticket(models.Model):
     title = models.CharField(max_length=128)
     description = models.CharField(max_length=2048, blank=True)
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    image = models.ImageField(null=True, blank=True, upload_to='user_images')
+    image = models.ImageField(null=True, blank=True, upload_to='user_images', storage=ticket_image_storage)
+    # Faux entre le dépôt d'une image et la fin de son traitement en arrière-plan (voir feed.images)
+    image_ready = models.BooleanField(default=True)
+    # Empreinte SHA-256 de l'image, nomme ses déclinaisons (voir feed.renditions). Vide pour les images traitées avant
+    # l'introduction des déclinaisons
+    image_digest = models.CharField(max_length=64, blank=True, default='')
     time_created = models.DateTimeField(auto_now_add=True)
+    # Incrémentée à chaque édition, invalide le fragment html du ticket en cache
+    version = models.PositiveIntegerField(default=0)
+    # Statistiques des reviews du ticket, dénormalisées et mises à jour en base lors de chaque création, édition ou
+    # suppression de review
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    REVIEW_STATS_FIELDS = ('review_count', 'rating_sum')
+
+    class Meta:
+        """
+        Indexe les tickets d'un utilisateur dans l'ordre du feed, et les tickets par image et par empreinte d'image
+        pour compter les références à une image partagée
+        """
+        indexes = [
+            models.Index(fields=['user', '-time_created'], name='ticket_user_time_idx'),
+            models.Index(fields=['image'], name='ticket_image_idx'),
+            models.Index(fields=['image_digest'], name='ticket_image_digest_idx'),
+        ]
+
+    @property
+    def image_renditions(self) -> dict[str, dict[str, str]]:
+        """
+        Urls des déclinaisons de l'image du ticket, par extension puis par nom de déclinaison
+        """
+        if not self.image or not self.image_digest:
+            return {}
+        return get_rendition_urls(self.image_digest, default_storage)
 
-    def resize_image(self):
-        image = Image.open(self.image)
-        image.thumbnail(IMAGE_MAX_SIZE)
-        image.save(self.image.path)
+    @property
+    def rating_average(self) -> float | None:
+        """
+        Note moyenne des reviews du ticket, None si le ticket n'a pas de review
+        """
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @classmethod
+    def update_review_stats(cls, ticket_id: int, review_count: int = 0, rating_sum: int = 0) -> None:
+        """
+        Applique en base une variation des statistiques des reviews d'un ticket et incrémente sa version afin
+        d'invalider son fragment html en cache
+
+        Doit être appelée dans la transaction enregistrant la création, l'édition ou la suppression de la review.
+        """
+        cls.objects.filter(pk=ticket_id).update(
+            review_count=models.F('review_count') + review_count,
+            rating_sum=models.F('rating_sum') + rating_sum,
+            version=models.F('version') + 1)
 
     def save(self, *args, **kwargs):
+        # Les statistiques des reviews sont uniquement mises à jour en base, l'édition d'un ticket ne les écrase pas
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.REVIEW_STATS_FIELDS]
+
+        # Une image non encore enregistrée sur le disque vient d'être déposée : elle est enregistrée avant le ticket
+        # sous un nom dérivé de son contenu. Si une image identique a déjà été traitée, ses déclinaisons sont
+        # réutilisées, sinon l'image est traitée en arrière-plan
+        image_changed = bool(self.image) and not self.image._committed
+        if image_changed:
+            self.image.save(self.image.name, self.image.file, save=False)
+            self.image_digest = Ticket.objects.filter(image=self.image.name, image_ready=True).exclude(
+                pk=self.pk).exclude(image_digest='').values_list('image_digest', flat=True).first() or ''
+            self.image_ready = bool(self.image_digest)
+        elif not self.image:
+            self.image_digest = ''
         super().save(*args, **kwargs)
-        if self.image:
-            self.resize_image()
+
+        from .images import schedule_ticket_image
+        if image_changed and not self.image_ready:
+            ticket_id = self.pk
+            transaction.on_commit(lambda: schedule_ticket_image(ticket_id))
 
 
 class Review(models.Model):
@@ -41,3 +114,45 @@ class Review(models.Model):
     headline = models.CharField(max_length=128)
     body = models.CharField(max_length=8192, blank=True)
     time_created = models.DateTimeField(auto_now_add=True)
+    # Incrémentée à chaque édition, invalide le fragment html de la review en cache
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """
+        Indexe les reviews d'un utilisateur dans l'ordre du feed, et les reviews d'un ticket par auteur pour savoir
+        si l'utilisateur a déjà répondu à un ticket
+        """
+        indexes = [
+            models.Index(fields=['user', '-time_created'], name='review_user_time_idx'),
+            models.Index(fields=['ticket', 'user'], name='review_ticket_user_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """
+    Entrée du timeline matérialisé d'un utilisateur : un post (ticket ou review) visualisable par son propriétaire.
+
+    Les entrées sont écrites à la création des posts et des abonnements lorsque le mode timeline est activé, la
+    lecture du feed devient alors un simple parcours d'index par utilisateur.
+    """
+    CONTENT_TYPE_CHOICES = [(TICKET, 'Ticket'), (REVIEW, 'Review')]
+
+    owner = models.ForeignKey(to=settings.AUTH_USER_MODEL,
+                              on_delete=models.CASCADE,
+                              related_name='feed_entries')
+    content_type = models.CharField(max_length=6, choices=CONTENT_TYPE_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    time_created = models.DateTimeField()
+
+    class Meta:
+        """
+        S'assure qu'un post n'apparait qu'une fois dans le timeline d'un utilisateur et indexe le timeline dans
+        l'ordre du feed
+        """
+        unique_together = ('owner', 'content_type', 'object_id',)
+        indexes = [
+            models.Index(fields=['owner', '-time_created', '-content_type', '-object_id'],
+                         name='feed_entry_timeline_idx'),
+            models.Index(fields=['content_type', 'object_id'],
+                         name='feed_entry_object_idx'),
+        ]
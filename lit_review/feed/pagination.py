@@ -0,0 +1,137 @@
+"""
+Pagination par curseur (keyset) des contenus du feed.
+
+Les tickets et les reviews sont fusionnés côté base de données : chaque table est interrogée triée et limitée à la
+taille de la page, puis les deux flux de clés sont fusionnés. Le coût d'une page dépend donc de sa taille et non de
+l'historique de l'utilisateur.
+
+Une clé de post est un tuple (time_created, content_type, pk), l'ordre du feed étant l'ordre décroissant de ces clés.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q, QuerySet
+
+CURSOR_SALT = "feed.pagination"
+
+TICKET = 'TICKET'
+REVIEW = 'REVIEW'
+
+PostKey = tuple[datetime, str, int]
+
+
+def encode_cursor(key: PostKey) -> str:
+    """
+    Reçoit la clé du dernier post d'une page et retourne un curseur opaque et signé permettant de récupérer la page
+    suivante.
+    """
+    time_created, content_type, pk = key
+    return signing.dumps([time_created.isoformat(), content_type, pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor: str | None) -> PostKey | None:
+    """
+    Reçoit un curseur transmis par l'utilisateur et retourne la clé correspondante.
+
+    Un curseur absent, altéré ou mal formé est ignoré : on retourne None et le feed repart de la première page.
+    """
+    if not cursor:
+        return None
+    try:
+        time_created, content_type, pk = signing.loads(cursor, salt=CURSOR_SALT)
+        return datetime.fromisoformat(time_created), content_type, int(pk)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+
+def filter_before(queryset: QuerySet, content_type: str, before: PostKey | None) -> QuerySet:
+    """
+    Restreint un queryset de tickets ou de reviews aux posts situés strictement après le curseur dans l'ordre du feed.
+
+    Le type de contenu étant constant sur le queryset, la comparaison du tuple (time_created, content_type, pk) se
+    simplifie en une condition sur time_created et pk.
+    """
+    if before is None:
+        return queryset
+    time_created, cursor_type, pk = before
+    if content_type < cursor_type:
+        return queryset.filter(time_created__lte=time_created)
+    if content_type > cursor_type:
+        return queryset.filter(time_created__lt=time_created)
+    return queryset.filter(Q(time_created__lt=time_created) | Q(time_created=time_created, pk__lt=pk))
+
+
+def iter_keys(queryset: QuerySet, content_type: str, before: PostKey | None = None) -> QuerySet:
+    """
+    Retourne les clés des posts d'un queryset de tickets ou de reviews, dans l'ordre du feed.
+    """
+    return filter_before(queryset, content_type, before).order_by(
+        '-time_created', '-pk').values_list('time_created', 'pk')
+
+
+def merge_keys(ticket_keys: Iterable, review_keys: Iterable) -> Iterator[PostKey]:
+    """
+    Fusionne les clés des tickets et des reviews, chacune déjà triée dans l'ordre du feed.
+    """
+    return heapq.merge(
+        ((time_created, TICKET, pk) for time_created, pk in ticket_keys),
+        ((time_created, REVIEW, pk) for time_created, pk in review_keys),
+        reverse=True,
+    )
+
+
+def get_page_keys(tickets: QuerySet,
+                  reviews: QuerySet,
+                  before: PostKey | None = None,
+                  page_size: int | None = None) -> tuple[list[PostKey], str | None]:
+    """
+    Retourne les clés d'une page du feed ainsi que le curseur de la page suivante.
+
+    Reçoit les querysets des tickets et des reviews visualisables et un éventuel curseur :
+        Chaque table n'est lue que sur page_size + 1 clés à partir du curseur
+        Les deux flux sont fusionnés, on conserve les page_size premières clés
+
+    Le curseur retourné vaut None lorsque la page est la dernière.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    ticket_keys = iter_keys(tickets, TICKET, before)[:page_size + 1]
+    review_keys = iter_keys(reviews, REVIEW, before)[:page_size + 1]
+
+    return slice_page(merge_keys(ticket_keys, review_keys), page_size)
+
+
+async def aget_page_keys(tickets: QuerySet,
+                         reviews: QuerySet,
+                         before: PostKey | None = None,
+                         page_size: int | None = None) -> tuple[list[PostKey], str | None]:
+    """
+    Version asynchrone de get_page_keys : les clés des tickets et celles des reviews sont lues simultanément.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    ticket_keys, review_keys = await asyncio.gather(
+        alist(iter_keys(tickets, TICKET, before)[:page_size + 1]),
+        alist(iter_keys(reviews, REVIEW, before)[:page_size + 1]))
+
+    return slice_page(merge_keys(ticket_keys, review_keys), page_size)
+
+
+async def alist(queryset: QuerySet) -> list:
+    return [row async for row in queryset]
+
+
+def slice_page(keys: Iterable[PostKey], page_size: int) -> tuple[list[PostKey], str | None]:
+    """
+    Retourne les page_size premières clés ainsi que le curseur de la page suivante, None s'il n'y a pas d'autre clé.
+    """
+    keys = list(islice(keys, page_size + 1))
+    if len(keys) > page_size:
+        keys = keys[:page_size]
+        return keys, encode_cursor(keys[-1])
+    return keys, None
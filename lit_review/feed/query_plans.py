@@ -0,0 +1,64 @@
+"""
+Contrôle des plans d'exécution SQLite des requêtes du feed et des abonnements.
+
+Chaque requête est analysée avec EXPLAIN QUERY PLAN, un parcours complet d'une table ou de l'un de ses index
+("SCAN <table>") signale un chemin d'accès non indexé.
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import QuerySet
+
+from users.models import UserFollows
+from users.views import get_user_followed, get_following_user
+from .loaders import get_tickets_for_feed, get_reviews_for_feed
+from .models import FeedEntry
+from .pagination import TICKET, REVIEW, iter_keys
+from .views import (get_users_viewable_tickets, get_users_viewable_reviews,
+                    get_users_posted_tickets, get_users_posted_reviews)
+
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)")
+
+
+def explain(queryset: QuerySet) -> list[str]:
+    """
+    Retourne les étapes du plan d'exécution SQLite d'un queryset
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def find_full_scans(queryset: QuerySet) -> list[str]:
+    """
+    Retourne les étapes du plan d'exécution d'un queryset correspondant au parcours complet d'une table ou d'un index
+    """
+    return [step for step in explain(queryset) if FULL_SCAN.match(step.strip())]
+
+
+def get_checked_querysets(user: User) -> dict[str, QuerySet]:
+    """
+    Retourne, par nom, les querysets des chemins d'accès du feed et des abonnements pour un utilisateur
+    """
+    page_size = 21
+    before = (datetime(2000, 1, 1, tzinfo=timezone.utc), REVIEW, 1)
+    return {
+        "feed_tickets": iter_keys(get_users_viewable_tickets(user), TICKET)[:page_size],
+        "feed_reviews": iter_keys(get_users_viewable_reviews(user), REVIEW)[:page_size],
+        "feed_tickets_before": iter_keys(get_users_viewable_tickets(user), TICKET, before)[:page_size],
+        "feed_reviews_before": iter_keys(get_users_viewable_reviews(user), REVIEW, before)[:page_size],
+        "posted_tickets": iter_keys(get_users_posted_tickets(user), TICKET)[:page_size],
+        "posted_reviews": iter_keys(get_users_posted_reviews(user), REVIEW)[:page_size],
+        "loaded_tickets": get_tickets_for_feed([1, 2, 3], user),
+        "loaded_reviews": get_reviews_for_feed([1, 2, 3], user),
+        "timeline": FeedEntry.objects.filter(owner=user).order_by(
+            '-time_created', '-content_type', '-object_id')[:page_size],
+        "followed_users": get_user_followed(user.pk),
+        "following_users": get_following_user(user.pk),
+        "followers": UserFollows.objects.filter(followed_user=user.pk).values('user'),
+    }
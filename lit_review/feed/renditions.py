@@ -0,0 +1,137 @@
+"""
+Déclinaisons (renditions) des images des tickets.
+
+Chaque image déposée est déclinée dans chacune des tailles de IMAGE_RENDITIONS (image réduite pour tenir dans la
+taille, proportions conservées) et chacun des formats de IMAGE_RENDITION_FORMATS. L'image originale n'est pas modifiée.
+
+Les déclinaisons sont nommées d'après l'empreinte SHA-256 du contenu de l'image originale et leur taille :
+renditions/<empreinte>/<largeur>x<hauteur>.<extension>. Le contenu d'une déclinaison ne change donc jamais sous un même
+nom, elle peut être mise en cache indéfiniment par les clients.
+"""
+from __future__ import annotations
+
+import hashlib
+from io import BytesIO
+from typing import IO, Iterator
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+
+RENDITIONS_DIRECTORY = "renditions"
+
+# Format PIL et options d'encodage de chaque extension de déclinaison
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+JPEG_BACKGROUND = (255, 255, 255)
+DIGEST_CHUNK_SIZE = 64 * 1024
+
+
+def get_rendition_name(digest: str, size: tuple[int, int], extension: str) -> str:
+    width, height = size
+    return f"{RENDITIONS_DIRECTORY}/{digest}/{width}x{height}.{extension}"
+
+
+def get_rendition_names(digest: str) -> list[str]:
+    """
+    Retourne les noms de l'ensemble des déclinaisons d'une image
+    """
+    return [get_rendition_name(digest, size, extension)
+            for size in settings.IMAGE_RENDITIONS.values()
+            for extension in settings.IMAGE_RENDITION_FORMATS]
+
+
+def get_rendition_urls(digest: str, storage: Storage) -> dict[str, dict[str, str]]:
+    """
+    Retourne les urls des déclinaisons d'une image, par extension puis par nom de déclinaison
+    """
+    return {extension: {name: storage.url(get_rendition_name(digest, size, extension))
+                        for name, size in settings.IMAGE_RENDITIONS.items()}
+            for extension in settings.IMAGE_RENDITION_FORMATS}
+
+
+def compute_digest(file: IO[bytes]) -> str:
+    """
+    Retourne l'empreinte SHA-256 du contenu d'un fichier, lu par blocs
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    while chunk := file.read(DIGEST_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def iter_sizes_by_area() -> Iterator[tuple[int, int]]:
+    """
+    Retourne les tailles des déclinaisons de la plus grande à la plus petite : chaque déclinaison peut alors être
+    réduite à partir de la précédente plutôt que de l'image originale
+    """
+    return iter(sorted(set(settings.IMAGE_RENDITIONS.values()), key=lambda size: size[0] * size[1], reverse=True))
+
+
+def open_for_renditions(file: IO[bytes]) -> Image.Image:
+    """
+    Ouvre une image en vue de sa réduction, en limitant la mémoire nécessaire à son décodage
+
+    Les dimensions sont contrôlées avant tout décodage. Une image JPEG est directement décodée à l'échelle réduite
+    (1/2, 1/4 ou 1/8) la plus petite restant au moins deux fois plus grande que la plus grande déclinaison.
+    """
+    image = Image.open(file)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        image.close()
+        raise ValueError(f"Image de {width} x {height} pixels, au-delà de IMAGE_MAX_PIXELS")
+    if image.format == "JPEG":
+        # L'orientation EXIF peut encore intervertir largeur et hauteur : la réduction porte sur le plus grand côté
+        side = 2 * max(max(size) for size in settings.IMAGE_RENDITIONS.values())
+        image.draft(image.mode, (side, side))
+    return image
+
+
+def convert_for_format(image: Image.Image, pil_format: str) -> Image.Image:
+    """
+    Convertit une image dans un mode accepté par le format : la transparence est conservée en WebP et remplacée par un
+    fond blanc en JPEG
+    """
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if not has_alpha:
+        return image.convert("RGB")
+    image = image.convert("RGBA")
+    if pil_format != "JPEG":
+        return image
+    background = Image.new("RGB", image.size, JPEG_BACKGROUND)
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def encode(image: Image.Image, extension: str) -> bytes:
+    pil_format, options = FORMATS[extension]
+    output = BytesIO()
+    convert_for_format(image, pil_format).save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def render_renditions(file: IO[bytes], digest: str, storage: Storage) -> list[str]:
+    """
+    Enregistre les déclinaisons manquantes d'une image, retourne les noms des déclinaisons écrites
+
+    La mémoire utilisée est bornée par IMAGE_MAX_PIXELS (voir open_for_renditions).
+    """
+    if all(storage.exists(name) for name in get_rendition_names(digest)):
+        return []
+    written = []
+    with open_for_renditions(file) as image:
+        # L'image est réduite sur place d'une déclinaison à la suivante, sans copie
+        ImageOps.exif_transpose(image, in_place=True)
+        for size in iter_sizes_by_area():
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            for extension in settings.IMAGE_RENDITION_FORMATS:
+                name = get_rendition_name(digest, size, extension)
+                if not storage.exists(name):
+                    written.append(storage.save(name, ContentFile(encode(image, extension))))
+    return written
@@ -0,0 +1,134 @@
+"""
+Recherche plein texte des tickets et reviews, indexés dans une table virtuelle FTS5 de la base SQLite.
+
+Chaque post est indexé sous un rowid encodant son type et sa clé primaire (2 * pk pour un ticket, 2 * pk + 1 pour une
+review) : la mise à jour et la suppression d'un post dans l'index sont ainsi des accès directs par rowid.
+
+Les résultats sont classés par pertinence (bm25, le titre pesant plus que le corps du texte) et restreints en base aux
+contenus visualisables par l'utilisateur.
+"""
+from __future__ import annotations
+
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, router
+from django.utils.dateparse import parse_datetime
+
+from .models import Ticket, Review
+from .pagination import PostKey, TICKET, REVIEW
+
+SEARCH_TABLE = "feed_search"
+CREATE_SEARCH_TABLE = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                       f"USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')")
+
+# Poids du titre et du corps du texte dans le classement bm25
+TITLE_WEIGHT = 4.0
+BODY_WEIGHT = 1.0
+
+SEARCH_SQL = f"""
+    WITH followed AS (SELECT followed_user_id FROM users_userfollows WHERE user_id = %s)
+    SELECT {SEARCH_TABLE}.rowid, COALESCE(ticket.time_created, review.time_created)
+    FROM {SEARCH_TABLE}
+    LEFT JOIN feed_ticket AS ticket ON {SEARCH_TABLE}.rowid %% 2 = 0 AND ticket.id = {SEARCH_TABLE}.rowid / 2
+    LEFT JOIN feed_review AS review ON {SEARCH_TABLE}.rowid %% 2 = 1 AND review.id = {SEARCH_TABLE}.rowid / 2
+    LEFT JOIN feed_ticket AS review_ticket ON review_ticket.id = review.ticket_id
+    WHERE {SEARCH_TABLE} MATCH %s
+    AND (ticket.user_id = %s
+         OR ticket.user_id IN followed
+         OR review.user_id = %s
+         OR review.user_id IN followed
+         OR review_ticket.user_id = %s)
+    ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})
+    LIMIT %s
+"""
+
+TOKEN = re.compile(r"\w+")
+
+
+def get_rowid(content_type: str, pk: int) -> int:
+    return 2 * pk + (content_type == REVIEW)
+
+
+def get_key_from_rowid(rowid: int) -> tuple[str, int]:
+    return (REVIEW if rowid % 2 else TICKET), rowid // 2
+
+
+def get_indexed_text(content_type: str, post: Ticket | Review) -> tuple[str, str]:
+    """
+    Retourne le titre et le corps du texte indexés d'un post
+    """
+    if content_type == TICKET:
+        return post.title, post.description
+    return post.headline, post.body
+
+
+def index_post(content_type: str, post: Ticket | Review) -> None:
+    """
+    Indexe un post créé ou édité, en remplaçant son éventuelle version précédente
+    """
+    rowid = get_rowid(content_type, post.pk)
+    with connections[router.db_for_write(type(post))].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                       [rowid, *get_indexed_text(content_type, post)])
+
+
+def unindex_post(content_type: str, post: Ticket | Review) -> None:
+    """
+    Retire un post supprimé de l'index
+    """
+    with connections[router.db_for_write(type(post))].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [get_rowid(content_type, post.pk)])
+
+
+def rebuild_index(using: str = "default") -> None:
+    """
+    Reconstruit intégralement l'index à partir des tickets et reviews existants
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(CREATE_SEARCH_TABLE)
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+                       f"SELECT 2 * id, title, description FROM feed_ticket")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+                       f"SELECT 2 * id + 1, headline, body FROM feed_review")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+def build_match_query(text: str) -> str | None:
+    """
+    Transforme la saisie de l'utilisateur en requête FTS5
+
+    Chaque mot est recherché comme terme littéral, le dernier mot comme préfixe. La syntaxe FTS5 saisie par
+    l'utilisateur n'est donc jamais interprétée. Retourne None si la saisie ne contient aucun mot.
+    """
+    tokens = TOKEN.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_posts_keys(user: User, text: str, limit: int | None = None) -> list[PostKey]:
+    """
+    Retourne les clés des posts visualisables par l'utilisateur correspondant à la recherche, par pertinence
+    décroissante
+    """
+    match_query = build_match_query(text)
+    if match_query is None:
+        return []
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+    with connections[router.db_for_read(Ticket)].cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [user.pk, match_query, user.pk, user.pk, user.pk, limit])
+        rows = cursor.fetchall()
+
+    keys = []
+    for rowid, time_created in rows:
+        content_type, pk = get_key_from_rowid(rowid)
+        if isinstance(time_created, str):
+            time_created = parse_datetime(time_created)
+        keys.append((time_created, content_type, pk))
+    return keys
@@ -0,0 +1,110 @@
+"""
+Réception des signaux de création et suppression de contenus et d'abonnements.
+
+Le feed en cache des utilisateurs n'est invalidé qu'une fois la transaction validée : une page calculée entre
+l'écriture et sa validation serait sinon mise en cache sous la nouvelle version, sans l'écriture.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.models import UserFollows
+from users.signals import follows_bulk_created
+from . import cache as feed_cache
+from . import events
+from . import search
+from . import timeline
+from .models import Ticket, Review
+from .pagination import TICKET, REVIEW
+
+
+@receiver(post_save, sender=Ticket)
+def on_ticket_saved(sender, instance: Ticket, created: bool, **kwargs):
+    """
+    Indexe un ticket créé ou édité pour la recherche.
+
+    Ajoute un nouveau ticket aux timelines des utilisateurs pouvant le visualiser, invalide leur feed en cache et
+    les notifie du nouveau contenu
+    """
+    search.index_post(TICKET, instance)
+    if created:
+        audience = timeline.get_post_audience(instance)
+        transaction.on_commit(lambda: feed_cache.invalidate_users(audience))
+        if timeline.is_timeline_enabled():
+            timeline.fan_out_post(TICKET, instance)
+        transaction.on_commit(lambda: events.publish_post(instance.user_id, audience))
+
+
+@receiver(post_save, sender=Review)
+def on_review_saved(sender, instance: Review, created: bool, **kwargs):
+    """
+    Indexe une review créée ou éditée pour la recherche.
+
+    Ajoute une nouvelle review aux timelines des utilisateurs pouvant la visualiser, invalide leur feed en cache et
+    les notifie du nouveau contenu
+    """
+    search.index_post(REVIEW, instance)
+    if created:
+        audience = timeline.get_post_audience(instance)
+        transaction.on_commit(lambda: feed_cache.invalidate_users(audience))
+        if timeline.is_timeline_enabled():
+            timeline.fan_out_post(REVIEW, instance)
+        transaction.on_commit(lambda: events.publish_post(instance.user_id, audience))
+
+
+@receiver(post_delete, sender=Ticket)
+def on_ticket_deleted(sender, instance: Ticket, **kwargs):
+    """
+    Retire un ticket supprimé de l'index de recherche et des timelines et invalide le feed en cache des utilisateurs
+    pouvant le visualiser
+    """
+    search.unindex_post(TICKET, instance)
+    audience = timeline.get_post_audience(instance)
+    transaction.on_commit(lambda: feed_cache.invalidate_users(audience))
+    if timeline.is_timeline_enabled():
+        timeline.remove_post(TICKET, instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def on_review_deleted(sender, instance: Review, **kwargs):
+    """
+    Retire une review supprimée de l'index de recherche et des timelines et invalide le feed en cache des
+    utilisateurs pouvant la visualiser
+    """
+    search.unindex_post(REVIEW, instance)
+    audience = timeline.get_post_audience(instance)
+    transaction.on_commit(lambda: feed_cache.invalidate_users(audience))
+    if timeline.is_timeline_enabled():
+        timeline.remove_post(REVIEW, instance.pk)
+
+
+@receiver(post_save, sender=UserFollows)
+def on_follow_saved(sender, instance: UserFollows, created: bool, **kwargs):
+    """
+    Complète le timeline d'un nouvel abonné avec l'historique de l'utilisateur suivi et invalide son feed en cache
+    """
+    if created:
+        transaction.on_commit(lambda: feed_cache.invalidate_users([instance.user_id]))
+        if timeline.is_timeline_enabled():
+            timeline.backfill_follow(instance.user_id, instance.followed_user_id)
+
+
+@receiver(follows_bulk_created, sender=UserFollows)
+def on_follows_bulk_created(sender, user_id: int, followed_users_id: list[int], **kwargs):
+    """
+    Complète le timeline d'un utilisateur avec l'historique des utilisateurs qu'il suit désormais et invalide son feed
+    en cache
+    """
+    transaction.on_commit(lambda: feed_cache.invalidate_users([user_id]))
+    if timeline.is_timeline_enabled():
+        timeline.backfill_follows(user_id, followed_users_id)
+
+
+@receiver(post_delete, sender=UserFollows)
+def on_follow_deleted(sender, instance: UserFollows, **kwargs):
+    """
+    Élague le timeline d'un utilisateur des posts d'un utilisateur qu'il ne suit plus et invalide son feed en cache
+    """
+    transaction.on_commit(lambda: feed_cache.invalidate_users([instance.user_id]))
+    if timeline.is_timeline_enabled():
+        timeline.prune_follow(instance.user_id, instance.followed_user_id)
@@ -0,0 +1,69 @@
+"""
+Stockage adressé par contenu des images déposées avec les tickets.
+
+Chaque image est enregistrée sous l'empreinte SHA-256 de son contenu : <dossier>/<2 premiers caractères>/<empreinte>
+<extension>. Une image identique à une image déjà enregistrée n'est pas écrite une seconde fois, les tickets la
+partagent. Le contenu d'un fichier ne change donc jamais sous un même nom.
+
+Le nombre de références à un fichier n'est pas stocké : il est déduit de la base de données. Les fichiers qu'aucun
+ticket n'utilise sont supprimés par la commande collect_ticket_images (voir feed.images.collect_unused_images), et non
+à la suppression du ticket : un fichier peut en effet être réutilisé par un ticket en cours d'enregistrement, avant
+que le ticket ne le référence en base. La date de modification d'un fichier est mise à jour à chaque réutilisation,
+seuls les fichiers non réutilisés depuis un délai de grâce sont supprimés.
+"""
+from __future__ import annotations
+
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .renditions import compute_digest
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stockage sur disque nommant les fichiers d'après l'empreinte de leur contenu
+    """
+
+    def get_content_name(self, name: str, content) -> str:
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = compute_digest(content)
+        return posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+    def save(self, name, content, max_length=None):
+        name = self.get_content_name(name, content)
+        try:
+            # Un fichier réutilisé n'est pas supprimé par delete_if_unmodified jusqu'à l'enregistrement du ticket
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name
+
+    def delete_if_unmodified(self, name: str, modified_before: float) -> bool:
+        """
+        Supprime un fichier dont la date de modification est antérieure au timestamp modified_before et retourne
+        True s'il a été supprimé
+
+        Le fichier est renommé avant d'être supprimé : un fichier réutilisé entre la lecture de sa date de
+        modification et son renommage est restauré, une réutilisation après son renommage l'écrit de nouveau.
+        """
+        path = self.path(name)
+        try:
+            if os.stat(path).st_mtime >= modified_before:
+                return False
+            deleted_path = f"{path}.deleted"
+            os.rename(path, deleted_path)
+        except FileNotFoundError:
+            return False
+        if os.stat(deleted_path).st_mtime >= modified_before:
+            os.replace(deleted_path, path)
+            return False
+        os.remove(deleted_path)
+        return True
+
+
+ticket_image_storage = ContentAddressedStorage()
@@ -0,0 +1,79 @@
+"""
+Affichage en flux (StreamingHttpResponse) de l'intégralité des posts d'un feed.
+
+Le squelette de la page est envoyé immédiatement, puis les posts sont chargés et rendus par lots au fil de la lecture
+du curseur de la base de données. La mémoire utilisée ne dépend que de la taille des lots, et non du nombre de posts
+de l'utilisateur.
+"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.http import HttpRequest, StreamingHttpResponse
+from django.template.loader import render_to_string
+
+from .loaders import load_posts
+from .models import FeedEntry
+from .pagination import PostKey, TICKET, REVIEW, iter_keys, merge_keys
+
+STREAM_MARKER = "<!-- stream:posts -->"
+
+
+def stream_keys(tickets: QuerySet, reviews: QuerySet) -> Iterator[PostKey]:
+    """
+    Retourne l'intégralité des clés des tickets et reviews dans l'ordre du feed, lues par lots depuis le curseur de
+    la base de données
+    """
+    chunk_size = settings.FEED_STREAMING_CHUNK_SIZE
+    return merge_keys(iter_keys(tickets, TICKET).iterator(chunk_size=chunk_size),
+                      iter_keys(reviews, REVIEW).iterator(chunk_size=chunk_size))
+
+
+def stream_timeline_keys(user: User) -> Iterator[PostKey]:
+    """
+    Retourne l'intégralité des clés du timeline matérialisé de l'utilisateur, lues par lots depuis le curseur de la
+    base de données
+    """
+    return FeedEntry.objects.filter(owner=user).order_by(
+        '-time_created', '-content_type', '-object_id').values_list(
+        'time_created', 'content_type', 'object_id').iterator(chunk_size=settings.FEED_STREAMING_CHUNK_SIZE)
+
+
+def iter_chunks(keys: Iterable[PostKey], chunk_size: int) -> Iterator[list[PostKey]]:
+    keys = iter(keys)
+    while chunk := list(islice(keys, chunk_size)):
+        yield chunk
+
+
+def stream_posts(request: HttpRequest,
+                 template_name: str,
+                 keys: Iterable[PostKey],
+                 context: dict | None = None,
+                 answered: bool = False) -> StreamingHttpResponse:
+    """
+    Retourne une réponse envoyant la page en flux
+
+    Reçoit la requête, le gabarit de la page, les clés des posts à afficher dans l'ordre du feed et le contexte de la
+    page :
+        Le gabarit est rendu sans ses posts et découpé à l'emplacement des posts
+        Le début de la page est envoyé immédiatement
+        Les posts sont chargés et rendus par lots de FEED_STREAMING_CHUNK_SIZE clés
+        La fin de la page est envoyée une fois l'ensemble des posts envoyé
+    """
+    context = context or {}
+    page = render_to_string(template_name, {**context, "stream_marker": STREAM_MARKER}, request)
+    head, tail = page.split(STREAM_MARKER)
+
+    def content() -> Iterator[str]:
+        yield head
+        for chunk in iter_chunks(keys, settings.FEED_STREAMING_CHUNK_SIZE):
+            yield render_to_string("feed/posts_page.html",
+                                   {**context, "posts": load_posts(chunk, request.user, answered)},
+                                   request)
+        yield tail
+
+    return StreamingHttpResponse(content())
@@ -0,0 +1,503 @@
+import asyncio
+import os
+import time
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users.follow_graph import follow_graph
+from users.models import UserFollows
+from users.views import arender_user_follow
+from . import cache as feed_cache
+from .images import collect_unused_images
+from .models import Review, Ticket
+from .pagination import REVIEW, TICKET, decode_cursor, encode_cursor, get_page_keys
+from .query_plans import explain, find_full_scans, get_checked_querysets
+from .search import search_posts_keys
+from .storage import ticket_image_storage
+from .timeline import get_timeline_page_keys
+from .views import (arender_user_feed, arender_user_feed_page, arender_user_posts, get_users_viewable_reviews,
+                    get_users_viewable_tickets, remove_review, save_review)
+
+
+def make_image(name: str = "cover.png", color: tuple[int, int, int] = (200, 30, 30)) -> SimpleUploadedFile:
+    content = BytesIO()
+    Image.new("RGB", (32, 32), color).save(content, "PNG")
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def age(path: str, seconds: float) -> None:
+    """
+    Antidate la date de modification d'un fichier ou d'un répertoire
+    """
+    timestamp = time.time() - seconds
+    os.utime(path, (timestamp, timestamp))
+
+
+class PaginationTests(TestCase):
+    """
+    Pagination par curseur du feed (voir feed.pagination)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="author", password="password")
+        tickets = [Ticket.objects.create(title=f"Livre {index}", description="description", user=cls.user)
+                   for index in range(5)]
+        for index, ticket in enumerate(tickets[:4]):
+            Review.objects.create(ticket=ticket, rating=3, headline=f"Critique {index}", user=cls.user)
+        # Posts de même date : l'ordre du feed est alors départagé par le type de contenu puis la clé primaire
+        cls.time_created = timezone.now()
+        Ticket.objects.update(time_created=cls.time_created)
+        Review.objects.update(time_created=cls.time_created)
+
+    def test_cursor_round_trip(self):
+        key = (self.time_created, REVIEW, 42)
+        self.assertEqual(decode_cursor(encode_cursor(key)), key)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = encode_cursor((self.time_created, TICKET, 42))
+        forged = signing.dumps([self.time_created.isoformat(), TICKET, 1], salt="other")
+        for tampered in (cursor[:-1] + ("A" if cursor[-1] != "A" else "B"), forged, "not a cursor", "", None):
+            with self.subTest(cursor=tampered):
+                self.assertIsNone(decode_cursor(tampered))
+
+    def test_pages_cover_equal_timestamps_without_duplicates_or_gaps(self):
+        expected = sorted([(self.time_created, TICKET, pk) for pk in Ticket.objects.values_list('pk', flat=True)]
+                          + [(self.time_created, REVIEW, pk) for pk in Review.objects.values_list('pk', flat=True)],
+                          reverse=True)
+        for page_size in (1, 2, 3, 4, 9):
+            with self.subTest(page_size=page_size):
+                keys, cursor, pages = [], None, 0
+                while True:
+                    page, next_cursor = get_page_keys(Ticket.objects.all(), Review.objects.all(),
+                                                      before=decode_cursor(cursor), page_size=page_size)
+                    keys.extend(page)
+                    pages += 1
+                    if next_cursor is None:
+                        break
+                    self.assertEqual(len(page), page_size)
+                    cursor = next_cursor
+                self.assertEqual(keys, expected)
+                self.assertEqual(pages, -(-len(expected) // page_size))
+
+    def test_last_page_has_no_cursor(self):
+        keys, cursor = get_page_keys(Ticket.objects.all(), Review.objects.all(), page_size=20)
+        self.assertEqual(len(keys), 9)
+        self.assertIsNone(cursor)
+
+
+class FeedQueryCountTests(TestCase):
+    """
+    Le nombre de requêtes d'une page du feed ne dépend ni du nombre de posts affichés ni du nombre de posts en base
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        authors = User.objects.bulk_create([User(username=f"author{index}") for index in range(3)])
+        UserFollows.objects.bulk_create([UserFollows(user=cls.user, followed_user=author) for author in authors])
+        # Tickets et reviews alternés : chaque page du feed contient des posts des deux types
+        for index in range(30):
+            ticket = Ticket.objects.create(title=f"Livre {index}", description="description",
+                                           user=authors[index % len(authors)])
+            Review.objects.create(ticket=ticket, rating=index % 6, headline=f"Critique {index}", body="critique",
+                                  user=authors[(index + 1) % len(authors)])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_home_query_count(self):
+        # Caches vides : session, utilisateur, abonnements, clés des tickets et des reviews, chargement des tickets
+        # et des reviews
+        for page_size in (5, 20):
+            with self.subTest(page_size=page_size), override_settings(FEED_PAGE_SIZE=page_size):
+                for cache in caches.all():
+                    cache.clear()
+                follow_graph.clear()
+                with self.assertNumQueries(7):
+                    response = self.client.get(reverse("feed:home"))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context["posts"]), page_size)
+
+
+class FeedCacheInvalidationTests(TestCase):
+    """
+    Une écriture n'invalide, une fois validée, que le feed en cache des utilisateurs pouvant visualiser le contenu
+    (voir feed.cache)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author", password="password")
+        cls.follower, cls.bystander = User.objects.bulk_create([User(username="follower"), User(username="bystander")])
+        UserFollows.objects.create(user=cls.follower, followed_user=cls.author)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        follow_graph.clear()
+
+    def cache_feeds(self) -> dict[int, int]:
+        """
+        Met en cache la première page du feed de chaque utilisateur et retourne leur version
+        """
+        versions = {}
+        for user in (self.author, self.follower, self.bystander):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(reverse("feed:home")).status_code, 200)
+            versions[user.pk] = feed_cache.get_cache().get(feed_cache._version_key(user.pk))
+        return versions
+
+    def get_invalidated(self, versions: dict[int, int]) -> set[int]:
+        return {user_id for user_id, version in versions.items()
+                if feed_cache.get_cache().get(feed_cache._version_key(user_id)) != version}
+
+    def test_post_invalidates_its_audience_on_commit(self):
+        versions = self.cache_feeds()
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(title="Livre", description="description", user=self.author)
+            # Transaction non validée : les pages en cache restent valides
+            self.assertEqual(self.get_invalidated(versions), set())
+        self.assertEqual(self.get_invalidated(versions), {self.author.pk, self.follower.pk})
+
+        self.client.force_login(self.bystander)
+        hits = feed_cache.get_stats()["hits"]
+        self.client.get(reverse("feed:home"))
+        self.assertEqual(feed_cache.get_stats()["hits"], hits + 1)
+
+    def test_follow_invalidates_follower_only(self):
+        versions = self.cache_feeds()
+        with self.captureOnCommitCallbacks(execute=True):
+            follow = UserFollows.objects.create(user=self.bystander, followed_user=self.author)
+        self.assertEqual(self.get_invalidated(versions), {self.bystander.pk})
+
+        versions = self.cache_feeds()
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertEqual(self.get_invalidated(versions), {self.bystander.pk})
+
+    def test_rolled_back_write_invalidates_nothing(self):
+        versions = self.cache_feeds()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Ticket.objects.create(title="Livre", description="description", user=self.author)
+        self.assertTrue(callbacks)
+        self.assertEqual(self.get_invalidated(versions), set())
+
+
+class AsyncViewTests(TestCase):
+    """
+    Vues asynchrones (settings.ASYNC_VIEWS) : les pages sont rendues hors de la boucle d'événements, le rendu des
+    gabarits pouvant accéder à la base de données
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        author = User.objects.create_user(username="author", password="password")
+        UserFollows.objects.create(user=cls.user, followed_user=author)
+        ticket = Ticket.objects.create(title="Livre suivi", description="description", user=author)
+        Review.objects.create(ticket=ticket, rating=4, headline="Ma critique", user=cls.user)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        follow_graph.clear()
+
+    def render_outside_event_loop(self, *args, **kwargs) -> HttpResponse:
+        with self.assertRaises(RuntimeError):
+            asyncio.get_running_loop()
+        return render(*args, **kwargs)
+
+    async def test_async_views_render_outside_event_loop(self):
+        for view, path, content in ((arender_user_feed, "/home/", "Livre suivi"),
+                                    (arender_user_feed_page, "/home/more/", "Livre suivi"),
+                                    (arender_user_posts, "/posts/", "Ma critique"),
+                                    (arender_user_follow, "/follow/", "author")):
+            with self.subTest(path=path), patch(f"{view.__module__}.render", self.render_outside_event_loop):
+                request = AsyncRequestFactory().get(path)
+                request.user = self.user
+                response = await view(request)
+                self.assertContains(response, content)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Les requêtes du feed et des abonnements n'effectuent aucun parcours complet de table (voir feed.query_plans)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        followed, follower = User.objects.bulk_create([User(username="followed"), User(username="follower")])
+        UserFollows.objects.bulk_create([UserFollows(user=cls.user, followed_user=followed),
+                                         UserFollows(user=follower, followed_user=cls.user)])
+
+    def setUp(self):
+        follow_graph.clear()
+
+    def test_querysets_are_indexed(self):
+        for name, queryset in get_checked_querysets(self.user).items():
+            with self.subTest(name):
+                self.assertEqual(find_full_scans(queryset), [], explain(queryset))
+
+
+class ReviewStatsTests(TestCase):
+    """
+    Statistiques dénormalisées des reviews d'un ticket (voir feed.views.save_review et remove_review)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.ticket = Ticket.objects.create(title="Livre", description="description", user=cls.user)
+
+    def assertStats(self, review_count: int, rating_sum: int):
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual((ticket.review_count, ticket.rating_sum), (review_count, rating_sum))
+        reviews = Review.objects.filter(ticket=ticket)
+        self.assertEqual((reviews.count(), sum(reviews.values_list('rating', flat=True))), (review_count, rating_sum))
+
+    def test_stats_follow_review_creation_edition_and_deletion(self):
+        first = Review(ticket=self.ticket, rating=4, headline="Critique", user=self.user)
+        save_review(first)
+        save_review(Review(ticket=self.ticket, rating=2, headline="Autre critique", user=self.user))
+        self.assertStats(2, 6)
+
+        first.rating = 5
+        save_review(first, previous_rating=4)
+        self.assertStats(2, 7)
+        # Édition sans changement de note
+        first.headline = "Critique éditée"
+        save_review(first, previous_rating=5)
+        self.assertStats(2, 7)
+
+        remove_review(first)
+        self.assertStats(1, 2)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).rating_average, 2)
+
+    def test_stale_ticket_does_not_overwrite_stats(self):
+        stale = Ticket.objects.get(pk=self.ticket.pk)
+        save_review(Review(ticket=self.ticket, rating=3, headline="Critique", user=self.user))
+
+        stale.title = "Titre édité"
+        stale.save()
+        self.assertStats(1, 3)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).title, "Titre édité")
+
+
+class SearchTests(TestCase):
+    """
+    Recherche plein texte des posts visualisables par l'utilisateur (voir feed.search)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.followed, cls.stranger = User.objects.bulk_create([User(username="followed"), User(username="stranger")])
+        UserFollows.objects.create(user=cls.user, followed_user=cls.followed)
+        cls.own_ticket = Ticket.objects.create(title="Dune", description="planète désertique", user=cls.user)
+        cls.followed_ticket = Ticket.objects.create(title="Dune Messiah", description="suite", user=cls.followed)
+        cls.stranger_ticket = Ticket.objects.create(title="Dune", description="autre ticket", user=cls.stranger)
+        # Réponse d'un utilisateur non suivi à un ticket de l'utilisateur
+        cls.reply = Review.objects.create(ticket=cls.own_ticket, rating=5, headline="Chef-d'œuvre",
+                                          body="Une fresque sur Arrakis", user=cls.stranger)
+
+    def setUp(self):
+        follow_graph.clear()
+
+    def search(self, text: str) -> set[tuple[str, int]]:
+        return {(content_type, pk) for _, content_type, pk in search_posts_keys(self.user, text)}
+
+    def test_results_are_restricted_to_viewable_posts(self):
+        self.assertEqual(self.search("dune"), {(TICKET, self.own_ticket.pk), (TICKET, self.followed_ticket.pk)})
+        self.assertEqual(self.search("arrakis"), {(REVIEW, self.reply.pk)})
+
+    def test_index_follows_edition_and_deletion(self):
+        self.followed_ticket.title = "Fondation"
+        self.followed_ticket.save()
+        self.assertEqual(self.search("messiah"), set())
+        self.assertEqual(self.search("fondation"), {(TICKET, self.followed_ticket.pk)})
+
+        self.reply.delete()
+        self.assertEqual(self.search("arrakis"), set())
+
+    def test_query_syntax_is_taken_literally(self):
+        # Interprétés par FTS5, ces opérateurs élargiraient ou restreindraient les résultats
+        self.assertEqual(self.search("dune OR fresque"), set())
+        self.assertEqual(self.search("dune NOT messiah"), set())
+        self.assertEqual(self.search("title:dune"), set())
+        self.assertEqual(self.search("dune*"), {(TICKET, self.own_ticket.pk), (TICKET, self.followed_ticket.pk)})
+        self.assertEqual(self.search('"*:^-'), set())
+
+
+@override_settings(FEED_TIMELINE_MODE=True)
+class TimelineParityTests(TestCase):
+    """
+    Le feed lu depuis le timeline matérialisé est identique au feed calculé en base (voir feed.timeline)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.author, cls.other = User.objects.bulk_create([User(username="author"), User(username="other")])
+
+    def setUp(self):
+        follow_graph.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            own_ticket = Ticket.objects.create(title="Mon livre", description="description", user=self.user)
+            # Réponse d'un utilisateur non suivi à un ticket de l'utilisateur
+            Review.objects.create(ticket=own_ticket, rating=4, headline="Réponse", user=self.other)
+            Ticket.objects.create(title="Autre livre", description="description", user=self.other)
+            for index in range(3):
+                ticket = Ticket.objects.create(title=f"Livre {index}", description="description", user=self.author)
+                Review.objects.create(ticket=ticket, rating=3, headline=f"Critique {index}", user=self.author)
+
+    def assertTimelineMatchesComputedFeed(self):
+        computed = get_page_keys(get_users_viewable_tickets(self.user), get_users_viewable_reviews(self.user),
+                                 page_size=50)
+        self.assertEqual(get_timeline_page_keys(self.user, page_size=50), computed)
+
+    def test_timeline_matches_computed_feed(self):
+        self.assertTimelineMatchesComputedFeed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow = UserFollows.objects.create(user=self.user, followed_user=self.author)
+        keys, _ = get_timeline_page_keys(self.user, page_size=50)
+        self.assertEqual(len(keys), 8)
+        self.assertTimelineMatchesComputedFeed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.filter(user=self.author).first().delete()
+        self.assertTimelineMatchesComputedFeed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        keys, _ = get_timeline_page_keys(self.user, page_size=50)
+        self.assertEqual(len(keys), 2)
+        self.assertTimelineMatchesComputedFeed()
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class TicketImageTests(TestCase):
+    """
+    Traitement des images des tickets (voir feed.images)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="author", password="password")
+
+    def setUp(self):
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_failed_processing_falls_back_to_original_image(self):
+        with self.assertLogs("feed.images", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(title="Livre", description="description", user=self.user,
+                                           image=SimpleUploadedFile("cover.jpg", b"not an image"))
+        ticket.refresh_from_db()
+        self.assertTrue(ticket.image_ready)
+        self.assertEqual(ticket.image_digest, "")
+        self.assertEqual(ticket.image_renditions, {})
+        self.assertEqual(ticket.version, 1)
+
+    def test_recover_processes_stalled_images(self):
+        # Traitement planifié puis perdu, la transaction étant validée sans exécuter les fonctions en attente
+        with self.captureOnCommitCallbacks(execute=False):
+            ticket = Ticket.objects.create(title="Livre", description="description", user=self.user,
+                                           image=make_image())
+        call_command("recover_ticket_images", "--older-than", "600", stdout=StringIO())
+        ticket.refresh_from_db()
+        self.assertFalse(ticket.image_ready)
+
+        age(ticket_image_storage.path(ticket.image.name), 1200)
+        call_command("recover_ticket_images", "--older-than", "600", stdout=StringIO())
+        ticket.refresh_from_db()
+        self.assertTrue(ticket.image_ready)
+        self.assertTrue(ticket.image_digest)
+        self.assertTrue(ticket.image_renditions)
+
+    def create_ticket(self, image: SimpleUploadedFile) -> Ticket:
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(title="Livre", description="description", user=self.user, image=image)
+        ticket.refresh_from_db()
+        return ticket
+
+    def age_image(self, ticket: Ticket, seconds: float) -> None:
+        age(ticket_image_storage.path(ticket.image.name), seconds)
+        age(default_storage.path(f"renditions/{ticket.image_digest}"), seconds)
+
+    def test_collect_deletes_unused_image_after_grace_period(self):
+        ticket = self.create_ticket(make_image())
+        name, digest = ticket.image.name, ticket.image_digest
+        self.assertTrue(digest)
+        ticket.delete()
+        self.assertEqual(collect_unused_images(grace_period=3600), (0, 0))
+
+        self.age_image(ticket, 7200)
+        self.assertEqual(collect_unused_images(grace_period=3600), (1, 1))
+        self.assertFalse(ticket_image_storage.exists(name))
+        self.assertFalse(default_storage.exists(f"renditions/{digest}"))
+
+    def test_collect_keeps_used_and_reused_images(self):
+        kept = self.create_ticket(make_image())
+        self.age_image(kept, 7200)
+        unused = self.create_ticket(make_image("other.png", (30, 30, 200)))
+        unused.delete()
+        self.age_image(unused, 7200)
+        # Image réutilisée par un ticket en cours d'enregistrement, pas encore référencée en base
+        self.assertEqual(ticket_image_storage.save("user_images/other.png", make_image("other.png", (30, 30, 200))),
+                         unused.image.name)
+
+        self.assertNotEqual(kept.image.name, unused.image.name)
+        self.assertEqual(collect_unused_images(grace_period=3600), (0, 0))
+        self.assertTrue(ticket_image_storage.exists(kept.image.name))
+        self.assertTrue(ticket_image_storage.exists(unused.image.name))
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=True)
+class AsyncTicketImageTests(TransactionTestCase):
+    """
+    Traitement des images des tickets par le pool de threads (voir feed.images)
+
+    Le traitement est réalisé par une autre connexion à la base de données : les tests ne peuvent donc pas être
+    exécutés dans une transaction annulée à leur issue.
+    """
+
+    def setUp(self):
+        media_root = TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="author", password="password")
+
+    def test_image_is_processed_in_background(self):
+        ticket = Ticket.objects.create(title="Livre", description="description", user=self.user, image=make_image())
+        self.assertFalse(ticket.image_ready)
+
+        deadline = time.monotonic() + 10
+        while not Ticket.objects.get(pk=ticket.pk).image_ready and time.monotonic() < deadline:
+            time.sleep(0.05)
+        ticket.refresh_from_db()
+        self.assertTrue(ticket.image_ready)
+        self.assertTrue(ticket.image_digest)
+        self.assertEqual(ticket.version, 1)
@@ -0,0 +1,161 @@
+"""
+Timeline matérialisé des utilisateurs (fan-out à l'écriture).
+
+Lorsque le mode timeline est activé (settings.FEED_TIMELINE_MODE), chaque post est recopié sous forme de FeedEntry
+dans le timeline de chacun des utilisateurs pouvant le visualiser :
+    - un ticket est visualisable par son auteur et les abonnés de son auteur ;
+    - une review est visualisable par son auteur, les abonnés de son auteur et l'auteur du ticket concerné.
+
+Les abonnements et désabonnements complètent et élaguent le timeline de l'abonné. La lecture du feed se résume alors
+à un parcours de l'index du timeline de l'utilisateur.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q, QuerySet
+
+from users.follow_graph import follow_graph
+from .models import FeedEntry, Ticket, Review
+from .pagination import PostKey, TICKET, REVIEW, alist, merge_keys, iter_keys, slice_page
+
+BATCH_SIZE = 500
+
+
+def is_timeline_enabled() -> bool:
+    """
+    Indique si le timeline matérialisé est maintenu et utilisé pour la lecture du feed
+    """
+    return settings.FEED_TIMELINE_MODE
+
+
+def get_followers_id(user_id: int) -> set[int]:
+    """
+    Reçoit un user_id et retourne les identifiants des utilisateurs qui y sont abonnés
+    """
+    return set(follow_graph.followers(user_id))
+
+
+def get_post_audience(post: Ticket | Review) -> set[int]:
+    """
+    Retourne les identifiants des utilisateurs pouvant visualiser un post
+    """
+    audience = get_followers_id(post.user_id)
+    audience.add(post.user_id)
+    if isinstance(post, Review):
+        # Le ticket peut déjà être supprimé lorsque la review est supprimée en cascade
+        audience.update(Ticket.objects.filter(pk=post.ticket_id).values_list('user', flat=True))
+    return audience
+
+
+def create_entries(entries: Iterable[FeedEntry]) -> None:
+    """
+    Enregistre des entrées de timeline par lots, les entrées déjà présentes sont ignorées
+    """
+    FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(content_type: str, post: Ticket | Review) -> None:
+    """
+    Ajoute un post nouvellement créé au timeline de chacun des utilisateurs pouvant le visualiser
+    """
+    create_entries(
+        FeedEntry(owner_id=owner_id, content_type=content_type, object_id=post.pk, time_created=post.time_created)
+        for owner_id in get_post_audience(post))
+
+
+def remove_post(content_type: str, post_id: int) -> None:
+    """
+    Retire un post supprimé de l'ensemble des timelines
+    """
+    FeedEntry.objects.filter(content_type=content_type, object_id=post_id).delete()
+
+
+def backfill_follow(user_id: int, followed_user_id: int) -> None:
+    """
+    Ajoute au timeline d'un nouvel abonné l'historique des posts de l'utilisateur suivi
+    """
+    backfill_follows(user_id, [followed_user_id])
+
+
+def backfill_follows(user_id: int, followed_users_id: list[int]) -> None:
+    """
+    Ajoute au timeline d'un nouvel abonné l'historique des posts des utilisateurs suivis, par lots de BATCH_SIZE
+    utilisateurs suivis
+    """
+    for start in range(0, len(followed_users_id), BATCH_SIZE):
+        batch = followed_users_id[start:start + BATCH_SIZE]
+        keys = merge_keys(iter_keys(Ticket.objects.filter(user__in=batch), TICKET),
+                          iter_keys(Review.objects.filter(user__in=batch), REVIEW))
+        create_entries(
+            FeedEntry(owner_id=user_id, content_type=content_type, object_id=pk, time_created=time_created)
+            for time_created, content_type, pk in keys)
+
+
+def prune_follow(user_id: int, followed_user_id: int) -> None:
+    """
+    Retire du timeline d'un utilisateur les posts d'un utilisateur qu'il ne suit plus
+
+    Les reviews répondant à un ticket de l'utilisateur restent visualisables et sont conservées.
+    """
+    FeedEntry.objects.filter(
+        Q(content_type=TICKET,
+          object_id__in=Ticket.objects.filter(user=followed_user_id).values('pk'))
+        | Q(content_type=REVIEW,
+            object_id__in=Review.objects.filter(user=followed_user_id).exclude(
+                ticket__user=user_id).values('pk')),
+        owner=user_id).delete()
+
+
+def rebuild_user_timeline(user: User, tickets, reviews) -> int:
+    """
+    Reconstruit le timeline d'un utilisateur à partir des querysets de tickets et reviews qu'il peut visualiser
+
+    Retourne le nombre d'entrées écrites.
+    """
+    FeedEntry.objects.filter(owner=user).delete()
+    entries = [
+        FeedEntry(owner=user, content_type=content_type, object_id=pk, time_created=time_created)
+        for time_created, content_type, pk in merge_keys(iter_keys(tickets, TICKET), iter_keys(reviews, REVIEW))]
+    create_entries(entries)
+    return len(entries)
+
+
+def get_timeline_entries_keys(user: User, before: PostKey | None, page_size: int) -> QuerySet:
+    """
+    Retourne les clés des page_size + 1 entrées du timeline de l'utilisateur suivant le curseur
+    """
+    entries = FeedEntry.objects.filter(owner=user)
+    if before is not None:
+        time_created, content_type, pk = before
+        entries = entries.filter(
+            Q(time_created__lt=time_created)
+            | Q(time_created=time_created, content_type__lt=content_type)
+            | Q(time_created=time_created, content_type=content_type, object_id__lt=pk))
+
+    return entries.order_by('-time_created', '-content_type', '-object_id').values_list(
+        'time_created', 'content_type', 'object_id')[:page_size + 1]
+
+
+def get_timeline_page_keys(user: User,
+                           before: PostKey | None = None,
+                           page_size: int | None = None) -> tuple[list[PostKey], str | None]:
+    """
+    Retourne les clés d'une page du timeline matérialisé de l'utilisateur ainsi que le curseur de la page suivante.
+
+    Les clés et curseurs sont identiques à ceux du feed calculé à la lecture (voir feed.pagination.get_page_keys).
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    return slice_page(get_timeline_entries_keys(user, before, page_size), page_size)
+
+
+async def aget_timeline_page_keys(user: User,
+                                  before: PostKey | None = None,
+                                  page_size: int | None = None) -> tuple[list[PostKey], str | None]:
+    """
+    Version asynchrone de get_timeline_page_keys
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    return slice_page(await alist(get_timeline_entries_keys(user, before, page_size)), page_size)
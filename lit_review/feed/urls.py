@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.urls import path
+
 from . import views
 
 app_name = "feed"
 
 urlpatterns = [
-    path("home/", views.render_user_feed, name="home"),
+    path("home/", views.arender_user_feed if settings.ASYNC_VIEWS else views.render_user_feed, name="home"),
+    path("home/more/", views.arender_user_feed_page if settings.ASYNC_VIEWS else views.render_user_feed_page,
+         name="home_more"),
+    path("home/events/", views.stream_feed_events, name="events"),
+    path("home/cache_stats/", views.render_feed_cache_stats, name="cache_stats"),
     path("new_ticket/", views.create_new_ticket_request, name="ticket_creation"),
     path("new_review/", views.create_new_review_request, name="review_creation"),
     path("new_review/<int:ticket_id>", views.respond_to_ticket_request, name="review_creation"),
-    path("posts/", views.render_user_posts, name="posts"),
+    path("posts/", views.arender_user_posts if settings.ASYNC_VIEWS else views.render_user_posts, name="posts"),
+    path("search/", views.render_search, name="search"),
     path("del_ticket/<int:ticket_id>", views.delete_ticket, name="delete_ticket"),
     path("del_review/<int:review_id>", views.delete_review, name="delete_review"),
     path("edit_ticket/<int:ticket_id>", views.edit_ticket, name="edit_ticket"),
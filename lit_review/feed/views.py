@@ -1,123 +1,262 @@
 from __future__ import annotations
 
-from itertools import chain
-from typing import Iterable
-
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q, QuerySet
-from django.db.models import Value, CharField, BooleanField
-from django.http import HttpRequest
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
-
-from users.views import get_user_followed
-from .forms import TicketCreationForm, ReviewCreationForm
+from django.urls import reverse
+
+from users.decorators import async_login_required
+from users.follow_graph import get_followed_id
+from . import cache as feed_cache
+from .events import iter_feed_events
+from .forms import TicketCreationForm, ReviewCreationForm, SearchForm
+from .loaders import aload_posts, load_posts
 from .models import Ticket, Review
+from .pagination import PostKey, aget_page_keys, decode_cursor, get_page_keys
+from .search import search_posts_keys
+from .streaming import stream_keys, stream_posts, stream_timeline_keys
+from .timeline import aget_timeline_page_keys, is_timeline_enabled, get_timeline_page_keys
 
 
-def get_users_viewable_reviews(user: User) -> Iterable:
+def get_users_viewable_reviews(user: User) -> QuerySet:
     """
-    Retourne un itérable de reviews visualisable par l'utilisateur
+    Retourne un queryset de reviews visualisable par l'utilisateur
 
     Reçoit un objet utilisateur, récupère les utilisateurs suivis par l'utilisateur correspondant :
         Filtre les reviews pour récupérer toutes celles visualisables par l'utilisateur
-        Annote celles pour lesquelles l'utilisateur a déjà répondu au ticket
 
-    Retourne un itérable de l'intégralité des reviews visualisables par l'utilisateur.
+    Retourne un queryset de l'intégralité des reviews visualisables par l'utilisateur.
     """
-    followed_user_id = get_user_followed(user.pk)
-
-    reviews_viewable_by_user = Review.objects.filter(
-        Q(user__in=followed_user_id) | Q(user=user) | Q(ticket__user=user)).annotate(
-        content_type=Value('REVIEW', CharField()))
+    followed_user_id = get_followed_id(user.pk)
 
-    # On annote les reviews ayant un ticket auquel l'utilisateur a déjà répondu pour ne pas afficher le bouton répondre
-    reviews_answered_by_user = reviews_viewable_by_user.filter(
-        Q(user=user) | Q(ticket__in=Review.objects.filter(
-            user=user).values('ticket'))).annotate(
-        answered=Value(True, BooleanField()))
+    # Les tickets de l'utilisateur sont filtrés en sous-requête plutôt que par jointure : chaque condition porte
+    # alors sur une colonne indexée de feed_review
+    return Review.objects.filter(
+        Q(user__in=followed_user_id) | Q(user=user) | Q(ticket__in=Ticket.objects.filter(user=user).values('pk')))
 
-    reviews_answerable_by_user = reviews_viewable_by_user.exclude(pk__in=reviews_answered_by_user)
 
-    return chain(reviews_answerable_by_user, reviews_answered_by_user)
-
-
-def get_users_viewable_tickets(user: User) -> Iterable:
+def get_users_viewable_tickets(user: User) -> QuerySet:
     """
-    Retourne un itérable de tickets visualisable par l'utilisateur
+    Retourne un queryset de tickets visualisable par l'utilisateur
 
     Reçoit un objet utilisateur, récupère les utilisateurs suivis par l'utilisateur correspondant :
         Filtre les tickets pour récupérer tous ceux visualisables par l'utilisateur
-        Annote ceux pour lesquels l'utilisateur a déjà créé une review
 
-    Retourne un itérable de l'intégralité des tickets visualisables par l'utilisateur.
+    Retourne un queryset de l'intégralité des tickets visualisables par l'utilisateur.
     """
-    followed_user_id = get_user_followed(user.pk)
+    followed_user_id = get_followed_id(user.pk)
 
-    ticket_viewable_by_user = Ticket.objects.filter(
-        Q(user__in=followed_user_id) | Q(user=user)).annotate(
-        content_type=Value('TICKET', CharField()))
+    return Ticket.objects.filter(
+        Q(user__in=followed_user_id) | Q(user=user))
 
-    # On annote les tickets auxquels l'utilisateur a déjà répondu pour ne pas afficher le bouton "répondre"
-    tickets_answered_by_user = ticket_viewable_by_user.filter(
-        Q(pk__in=Review.objects.filter(user=user).values('ticket'))).annotate(
-        answered=Value(True, BooleanField()))
 
-    tickets_answerable_by_user = ticket_viewable_by_user.exclude(pk__in=tickets_answered_by_user)
+def get_user_feed_page_keys(user: User, before: PostKey | None) -> tuple[list[PostKey], str | None]:
+    """
+    Retourne les clés d'une page du feed de l'utilisateur ainsi que le curseur de la page suivante
 
-    return chain(tickets_answerable_by_user, tickets_answered_by_user)
+    En mode timeline, la page est directement lue depuis le timeline matérialisé de l'utilisateur, sinon les tickets
+    et reviews visualisables par l'utilisateur sont fusionnés en base.
+    """
+    if is_timeline_enabled():
+        return get_timeline_page_keys(user, before=before)
+    return get_page_keys(
+        get_users_viewable_tickets(user),
+        get_users_viewable_reviews(user),
+        before=before)
 
 
-@login_required
-def render_user_feed(request: HttpRequest) -> HttpRequest:
+def get_user_feed_context(request: HttpRequest) -> dict:
     """
-    Permet à un utilisateur de visualiser les contenus qu'il a créé sur LITReview
+    Retourne le contexte d'affichage d'une page du feed de l'utilisateur authentifié
 
-    Reçoit une requête par un utilisateur authentifié :
+    Reçoit une requête pouvant contenir un curseur "before" :
         Récupère les reviews visualisables par l'utilisateur,
         Récupère les tickets visualisables par l'utilisateur,
-        Ordonne les reviews et tickets par date de création
+        Fusionne en base les reviews et tickets par date de création pour n'en charger qu'une page
+
+    Les clés des posts de la page sont lues depuis le cache du feed de l'utilisateur lorsqu'elles y sont présentes.
+
+    Le contexte contient les posts de la page, le curseur de la page suivante, l'url de chargement des pages
+    suivantes et celle du flux de notification des nouveaux contenus.
+    """
+    cursor = request.GET.get("before")
+    keys, next_cursor = feed_cache.get_cached_page(
+        request.user.pk, cursor, lambda: get_user_feed_page_keys(request.user, decode_cursor(cursor)))
+
+    return {"posts": load_posts(keys, request.user),
+            "next_cursor": next_cursor,
+            "more_url": reverse("feed:home_more"),
+            "events_url": get_events_url()}
+
+
+async def aget_user_feed_page_keys(user: User, before: PostKey | None) -> tuple[list[PostKey], str | None]:
+    """
+    Version asynchrone de get_user_feed_page_keys
+    """
+    if is_timeline_enabled():
+        return await aget_timeline_page_keys(user, before=before)
+    # Les utilisateurs suivis sont lus depuis le graphe d'abonnements, chargé au besoin depuis la base de données
+    tickets, reviews = await sync_to_async(
+        lambda: (get_users_viewable_tickets(user), get_users_viewable_reviews(user)))()
+    return await aget_page_keys(tickets, reviews, before=before)
+
+
+async def aget_user_feed_context(request: HttpRequest) -> dict:
+    """
+    Version asynchrone de get_user_feed_context
+    """
+    cursor = request.GET.get("before")
+    keys, next_cursor = await feed_cache.aget_cached_page(
+        request.user.pk, cursor, lambda: aget_user_feed_page_keys(request.user, decode_cursor(cursor)))
+
+    return {"posts": await aload_posts(keys, request.user),
+            "next_cursor": next_cursor,
+            "more_url": reverse("feed:home_more"),
+            "events_url": get_events_url()}
+
 
-    Les reviews et tickets sont alors transmis au contexte lors de l'affichage du feed de l'utilisateur.
+def get_events_url() -> str | None:
     """
-    reviews = get_users_viewable_reviews(request.user)
-    tickets = get_users_viewable_tickets(request.user)
+    Retourne l'url du flux de notification des nouveaux contenus, None s'il est désactivé
+    """
+    return reverse("feed:events") if settings.FEED_EVENTS_ENABLED else None
+
+
+@login_required
+def render_user_feed(request: HttpRequest) -> HttpRequest:
+    """
+    Permet à un utilisateur de visualiser les contenus qu'il peut consulter sur LITReview
 
-    posts = sorted(
-        chain(reviews, tickets),
-        key=lambda post: post.time_created,
-        reverse=True
-    )
+    Seule la première page du feed (ou celle désignée par le curseur "before") est affichée, les pages suivantes
+    sont chargées au défilement par la vue render_user_feed_page.
+
+    En mode flux, l'intégralité du feed est envoyée en flux, par lots de posts.
+    """
+    if settings.FEED_STREAMING_MODE:
+        if is_timeline_enabled():
+            keys = stream_timeline_keys(request.user)
+        else:
+            keys = stream_keys(get_users_viewable_tickets(request.user), get_users_viewable_reviews(request.user))
+        return stream_posts(request, "feed/home.html", keys)
 
     return render(request,
                   "feed/home.html",
-                  context={"posts": posts})
+                  context=get_user_feed_context(request))
+
+
+@async_login_required
+async def arender_user_feed(request: HttpRequest) -> HttpRequest:
+    """
+    Version asynchrone de render_user_feed, utilisée lorsque settings.ASYNC_VIEWS est vrai
+
+    En mode flux, la page est envoyée par render_user_feed, exécutée hors de la boucle d'événements.
+    """
+    if settings.FEED_STREAMING_MODE:
+        return await sync_to_async(render_user_feed)(request)
+
+    return await sync_to_async(render)(request,
+                                       "feed/home.html",
+                                       context=await aget_user_feed_context(request))
+
+
+@login_required
+def render_user_feed_page(request: HttpRequest) -> HttpRequest:
+    """
+    Permet le chargement incrémental du feed
+
+    Reçoit une requête contenant un curseur "before" et retourne uniquement le html des posts de la page
+    correspondante, suivi de l'élément permettant le chargement de la page suivante.
+    """
+    return render(request,
+                  "feed/posts_page.html",
+                  context=get_user_feed_context(request))
+
+
+@async_login_required
+async def arender_user_feed_page(request: HttpRequest) -> HttpRequest:
+    """
+    Version asynchrone de render_user_feed_page, utilisée lorsque settings.ASYNC_VIEWS est vrai
+    """
+    return await sync_to_async(render)(request,
+                                       "feed/posts_page.html",
+                                       context=await aget_user_feed_context(request))
+
+
+@async_login_required
+async def stream_feed_events(request: HttpRequest) -> HttpResponse:
+    """
+    Envoie en Server-Sent Events à l'utilisateur authentifié le nombre de nouveaux contenus publiés dans son feed (voir
+    feed.events)
+
+    La connexion reste ouverte sans occuper de fil d'exécution : la vue doit être servie en ASGI.
+    """
+    if not settings.FEED_EVENTS_ENABLED:
+        # Un client EventSource recevant une réponse 204 ne tente pas de se reconnecter
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(iter_feed_events(request.user.pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Le serveur frontal (nginx) ne doit pas retenir les événements
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required
+def render_search(request: HttpRequest) -> HttpRequest:
+    """
+    Permet la recherche plein texte parmi les contenus visualisables par l'utilisateur
+
+    Reçoit une requête pouvant contenir un formulaire de recherche :
+        S'il est valide, récupère les posts visualisables par l'utilisateur correspondant à la recherche, par
+        pertinence décroissante
+
+    Le formulaire et les posts trouvés sont alors transmis au contexte lors de l'affichage de la page de recherche.
+    """
+    search_form = SearchForm(request.GET or None)
+    posts = []
+    if search_form.is_valid():
+        posts = load_posts(search_posts_keys(request.user, search_form.cleaned_data["q"]), request.user)
+
+    return render(request,
+                  "feed/search.html",
+                  context={"search_form": search_form,
+                           "posts": posts})
+
+
+@user_passes_test(lambda user: user.is_staff)
+def render_feed_cache_stats(request: HttpRequest) -> JsonResponse:
+    """
+    Permet aux membres de l'équipe de consulter les compteurs du cache du feed du processus courant afin de le
+    dimensionner.
+    """
+    return JsonResponse(feed_cache.get_stats())
 
 
 def get_users_posted_reviews(user: User) -> QuerySet:
     """
-    Retourne un itérable de reviews créées par l'utilisateur
+    Retourne un queryset de reviews créées par l'utilisateur
 
     Reçoit un objet utilisateur :
     Retourne les reviews créées par l'utilisateur
     """
-    return Review.objects.filter(user=user).annotate(
-        content_type=Value('REVIEW', CharField()),
-    )
+    return Review.objects.filter(user=user)
 
 
 def get_users_posted_tickets(user: User) -> QuerySet:
     """
-    Retourne un itérable de tickets créés par l'utilisateur
+    Retourne un queryset de tickets créés par l'utilisateur
 
     Reçoit un objet utilisateur :
     Retourne les tickets créés par l'utilisateur
     """
-    return Ticket.objects.filter(user=user).annotate(
-        content_type=Value('TICKET', CharField())
-    )
+    return Ticket.objects.filter(user=user)
 
 
 @login_required
@@ -125,33 +264,57 @@ def render_user_posts(request: HttpRequest) -> HttpRequest:
     """
     Permet l'affichage des contenus créés par l'utilisateur
 
-    Reçoit une requête par un utilisateur authentifié :
+    Reçoit une requête par un utilisateur authentifié, pouvant contenir un curseur "before" :
         Récupère les reviews créées par l'utilisateur,
         Récupère les tickets créés par l'utilisateur,
-        Ordonne les reviews et tickets par date de création
+        Fusionne en base les reviews et tickets par date de création pour n'en charger qu'une page
+
+    Les posts de la page et le curseur de la page suivante sont alors transmis au contexte lors de l'affichage du
+    feed de l'utilisateur.
 
-    Les reviews et tickets sont alors transmis au contexte lors de l'affichage du feed de l'utilisateur.
+    En mode flux, l'intégralité des posts de l'utilisateur est envoyée en flux, par lots de posts.
     """
+    own_tickets = get_users_posted_tickets(request.user)
+    own_reviews = get_users_posted_reviews(request.user)
 
-    own_reviews = get_users_posted_reviews(request.user.pk)
     # L'intégralité des reviews créées par l'utilisateur concerne un ticket auquel il a répondu
-    own_reviews = own_reviews.annotate(answered=Value(True, BooleanField()))
-
-    own_tickets = get_users_posted_tickets(request.user)
     # L'utilisateur ne peut pas répondre à un ticket depuis la page de visualisation de son contenu créé
-    own_tickets = own_tickets.annotate(answered=Value(True, BooleanField()))
+    if settings.FEED_STREAMING_MODE:
+        return stream_posts(request, "feed/home.html", stream_keys(own_tickets, own_reviews),
+                            context={"edit": True}, answered=True)
+
+    keys, next_cursor = get_page_keys(own_tickets, own_reviews, before=decode_cursor(request.GET.get("before")))
+    posts = load_posts(keys, request.user, answered=True)
 
-    posts = sorted(
-        chain(own_reviews, own_tickets),
-        key=lambda post: post.time_created,
-        reverse=True
-    )
     return render(request,
                   "feed/home.html",
                   context={"posts": posts,
+                           "next_cursor": next_cursor,
                            "edit": True})
 
 
+@async_login_required
+async def arender_user_posts(request: HttpRequest) -> HttpRequest:
+    """
+    Version asynchrone de render_user_posts, utilisée lorsque settings.ASYNC_VIEWS est vrai
+
+    En mode flux, la page est envoyée par render_user_posts, exécutée hors de la boucle d'événements.
+    """
+    if settings.FEED_STREAMING_MODE:
+        return await sync_to_async(render_user_posts)(request)
+
+    keys, next_cursor = await aget_page_keys(get_users_posted_tickets(request.user),
+                                             get_users_posted_reviews(request.user),
+                                             before=decode_cursor(request.GET.get("before")))
+    posts = await aload_posts(keys, request.user, answered=True)
+
+    return await sync_to_async(render)(request,
+                                       "feed/home.html",
+                                       context={"posts": posts,
+                                                "next_cursor": next_cursor,
+                                                "edit": True})
+
+
 @login_required
 def make_ticket(request: HttpRequest, instance: TicketCreationForm | None = None) -> Ticket | None:
     """
@@ -202,6 +365,32 @@ def make_review(request: HttpRequest, ticket_id: int, instance: ReviewCreationFo
     return None
 
 
+def save_review(review: Review, previous_rating: int | None = None) -> None:
+    """
+    Enregistre une review créée ou éditée et met à jour les statistiques des reviews de son ticket
+
+    Reçoit la review et, pour une review éditée, sa note avant édition. L'enregistrement de la review et la mise à
+    jour des statistiques sont réalisés dans la même transaction.
+    """
+    with transaction.atomic():
+        if review._state.adding:
+            review.save()
+            Ticket.update_review_stats(review.ticket_id, review_count=1, rating_sum=review.rating)
+        else:
+            review.save()
+            if previous_rating != review.rating:
+                Ticket.update_review_stats(review.ticket_id, rating_sum=review.rating - previous_rating)
+
+
+def remove_review(review: Review) -> None:
+    """
+    Supprime une review et met à jour les statistiques des reviews de son ticket dans la même transaction
+    """
+    with transaction.atomic():
+        review.delete()
+        Ticket.update_review_stats(review.ticket_id, review_count=-1, rating_sum=-review.rating)
+
+
 @login_required
 def post_create_new_ticket_request(request: HttpRequest) -> HttpRequest:
     """
@@ -247,7 +436,7 @@ def post_respond_to_ticket_request(request: HttpRequest, ticket_id: int) -> Http
     """
     new_review = make_review(request, ticket_id)
     if new_review is not None:
-        new_review.save()
+        save_review(new_review)
     return redirect("main:homepage")
 
 
@@ -308,7 +497,7 @@ def post_create_new_review_request(request: HttpRequest) -> HttpRequest:
         if new_review is not None:
             new_ticket.save()
             new_review.ticket_id = new_ticket.pk
-            new_review.save()
+            save_review(new_review)
         return redirect('main:homepage')
     review_form = ReviewCreationForm()
     ticket_form = TicketCreationForm()
@@ -378,7 +567,8 @@ def delete_review(request: HttpRequest, review_id: int) -> HttpRequest:
     Contrôle l'existence de la review :
         Si elle existe, elle est récupérée depuis la bdd.
     Contrôle le créateur de la review :
-        Si l'utilisateur est l'auteur de la review, celle-ci est supprimée
+        Si l'utilisateur est l'auteur de la review, celle-ci est supprimée et les statistiques des reviews de son
+        ticket sont mises à jour
 
     L'utilisateur est redirigé vers la page de visualisation du contenu créé
     """
@@ -389,7 +579,7 @@ def delete_review(request: HttpRequest, review_id: int) -> HttpRequest:
         return redirect('feed:posts')
 
     if review.user == request.user:
-        review.delete()
+        remove_review(review)
         messages.error(request, "Votre critique est bien supprimée !")
 
     else:
@@ -412,7 +602,8 @@ def edit_ticket(request: HttpRequest, ticket_id: int):
         Si l'auteur n'est pas l'utilisateur authentifié, il est redirigé vers la page de visualisation du contenu créé.
 
     Si la requête est POST, elle est transmise à la fonction appropriée qui s'occupera de la mise à jour du ticket
-    avant redirection de l'utilisateur vers la page de visualisation du contenu créé.
+    avant redirection de l'utilisateur vers la page de visualisation du contenu créé. La version du ticket est
+    incrémentée afin d'invalider son fragment html en cache.
 
     Si la requête n'est pas une requête POST :
         Instancie un formulaire de création de ticket avec le ticket récupéré en tant qu'instance
@@ -431,6 +622,7 @@ def edit_ticket(request: HttpRequest, ticket_id: int):
     if request.method == 'POST':
         updated_ticket = make_ticket(request, instance=ticket)
         if updated_ticket is not None:
+            updated_ticket.version = F('version') + 1
             updated_ticket.save()
             return redirect('feed:posts')
 
@@ -457,7 +649,8 @@ def edit_review(request: HttpRequest, review_id: int):
             contenu créé.
 
         Si la requête est POST, elle est transmise à la fonction appropriée qui s'occupera de la mise à jour de la
-        review avant redirection de l'utilisateur vers la page de visualisation du contenu créé.
+        review avant redirection de l'utilisateur vers la page de visualisation du contenu créé. La version de la
+        review est incrémentée afin d'invalider son fragment html en cache.
 
         Si la requête n'est pas une requête POST :
             Instancie un formulaire de création de review
@@ -474,9 +667,11 @@ def edit_review(request: HttpRequest, review_id: int):
         return redirect('feed:posts')
 
     if request.method == 'POST':
-        updated_review = make_review(request, ticket_id=review.ticket, instance=review)
+        previous_rating = review.rating
+        updated_review = make_review(request, ticket_id=review.ticket_id, instance=review)
         if updated_review is not None:
-            updated_review.save()
+            updated_review.version = F('version') + 1
+            save_review(updated_review, previous_rating=previous_rating)
             return redirect('feed:posts')
 
     review_form = ReviewCreationForm(instance=review)
@@ -34,9 +34,10 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.replica.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'lit_review.urls'
@@ -65,8 +66,25 @@ STATICFILES_DIR = [
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Service des fichiers de MEDIA_ROOT (voir main.media) :
+#   MEDIA_SENDFILE_HEADER : None pour envoyer les fichiers depuis Django, "X-Sendfile" (Apache, lighttpd) ou
+#   "X-Accel-Redirect" (nginx, les fichiers étant alors servis depuis l'emplacement interne
+#   MEDIA_ACCEL_REDIRECT_PREFIX) pour déléguer leur envoi au serveur frontal
+#   MEDIA_CACHE_MAX_AGE : durée de mise en cache par les clients, en secondes, des fichiers pouvant être modifiés
+#   MEDIA_IMMUTABLE_PATTERN : chemins des fichiers nommés d'après leur contenu (voir feed.storage et
+#   feed.renditions), mis en cache indéfiniment
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_IMMUTABLE_PATTERN = r'user_images/[0-9a-f]{2}/[0-9a-f]{64}\.\w+|renditions/[0-9a-f]{64}/\d+x\d+\.\w+'
+
 WSGI_APPLICATION = 'lit_review.wsgi.application'
 
+# Versions asynchrones des pages de lecture (flux, contenus de l'utilisateur, abonnements), à activer lorsque
+# l'application est servie en ASGI (lit_review.asgi, par exemple avec uvicorn). Servie en WSGI, chacune de ces vues
+# serait exécutée dans sa propre boucle d'événements.
+ASYNC_VIEWS = False
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -74,8 +92,67 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Connexions conservées d'une requête à l'autre, vérifiées avant d'être réutilisées
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Copie de la base principale, tenue à jour par la commande sync_replica (voir main.replica)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Copie de test enregistrée sur le disque, à côté de son fichier de synchronisation
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db_replica.sqlite3',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['main.replica.ReplicaRouter']
+
+# Lectures sur la copie de la base (voir main.replica) :
+#   REPLICA_DATABASE : alias de la copie
+#   REPLICA_READ_VIEWS : vues dont les lectures des requêtes GET et HEAD sont faites sur la copie
+#   REPLICA_PIN_SECONDS : durée, en secondes, pendant laquelle un utilisateur ayant écrit en base lit la base
+#   principale, le temps que ses écritures parviennent à la copie
+#   REPLICA_MAX_LAG : retard maximal, en secondes, de la copie sur la base principale au-delà duquel les lectures
+#   sont faites sur la base principale
+# REPLICA_PIN_SECONDS doit être supérieur à REPLICA_MAX_LAG : une copie lue à l'issue du délai a alors été
+# synchronisée après l'écriture.
+REPLICA_DATABASE = 'replica'
+REPLICA_READ_VIEWS = (
+    'feed.views.render_user_feed',
+    'feed.views.render_user_feed_page',
+    'feed.views.render_user_posts',
+    'feed.views.render_search',
+    'users.views.render_user_follow',
+    'feed.views.arender_user_feed',
+    'feed.views.arender_user_feed_page',
+    'feed.views.arender_user_posts',
+    'users.views.arender_user_follow',
+)
+REPLICA_PIN_SECONDS = 15
+REPLICA_MAX_LAG = 10
+
+# Profil SQLite appliqué à chaque nouvelle connexion (voir main.db), vide pour conserver la configuration par défaut
+#   synchronous : NORMAL, les dernières transactions peuvent être perdues en cas de coupure de courant, sans risque
+#   de corruption en mode WAL
+#   mmap_size : taille, en octets, de la base lue par projection en mémoire
+#   cache_size : taille du cache de pages de chaque connexion, en Kio si négative
+#   busy_timeout : attente maximale, en millisecondes, d'un verrou détenu par une autre connexion
+#   temp_store : tables et index temporaires en mémoire
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16 * 1024,
+    'busy_timeout': 20_000,
+    'temp_store': 'MEMORY',
 }
+# Mode WAL : les lectures ne bloquent plus les écritures et inversement. Le mode est enregistré dans le fichier de la
+# base, qu'il convertit définitivement, et s'accompagne des fichiers <base>-wal et <base>-shm : à activer pour une
+# base de production, et non pour la base de démonstration du dépôt
+SQLITE_WAL = False
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -101,6 +178,118 @@ LOGIN_URL = 'users:authentication_page'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_URL = 'user:authentication_page'
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Le cache local en mémoire est propre à chaque processus : avec plusieurs processus, un cache partagé (Redis,
+# Memcached) est nécessaire pour que les invalidations du feed soient vues de tous les processus.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lit_review',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Fragments html des tickets et reviews, partagés entre utilisateurs et versionnés à chaque édition
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lit_review_fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+# Sessions et authentification
+# Sessions lues depuis le cache et enregistrées en base de données : une session présente en cache ne coûte aucune
+# requête. 'django.contrib.sessions.backends.signed_cookies' stocke la session dans un cookie signé, sans cache ni
+# base de données, mais une session ne peut alors plus être révoquée côté serveur.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+# Cache de l'utilisateur authentifié (voir users.auth) : alias du cache utilisé et durée de vie en secondes, 0 pour
+# charger l'utilisateur depuis la base de données à chaque requête
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Feed
+# Nombre de posts (tickets et reviews) affichés par page du feed
+FEED_PAGE_SIZE = 20
+# Active le timeline matérialisé (feed.models.FeedEntry) : le feed de chaque utilisateur est écrit à la création des
+# contenus et abonnements plutôt que recalculé à chaque lecture.
+# Après activation, le timeline doit être initialisé avec "python manage.py rebuild_feed_timeline"
+FEED_TIMELINE_MODE = False
+# Cache des pages du feed (voir feed.cache) : alias du cache utilisé et durée de vie des pages en secondes
+FEED_CACHE_ALIAS = 'default'
+FEED_CACHE_TIMEOUT = 300
+# Envoie en flux (voir feed.streaming) l'intégralité du feed et des posts de l'utilisateur plutôt qu'une page,
+# les posts étant chargés et rendus par lots de FEED_STREAMING_CHUNK_SIZE
+FEED_STREAMING_MODE = False
+FEED_STREAMING_CHUNK_SIZE = 100
+# Notifie en temps réel (Server-Sent Events, voir feed.events) les nouveaux contenus du feed aux utilisateurs l'ayant
+# ouvert. À activer lorsque l'application est servie par un unique processus ASGI : chaque connexion ouverte
+# occuperait sinon un fil d'exécution.
+#   FEED_EVENTS_HEARTBEAT : intervalle, en secondes, des messages maintenant la connexion ouverte
+#   FEED_EVENTS_MAX_AGE : durée, en secondes, au-delà de laquelle le flux est fermé et le client se reconnecte
+FEED_EVENTS_ENABLED = False
+FEED_EVENTS_HEARTBEAT = 15
+FEED_EVENTS_MAX_AGE = 300
+
+# Search
+# Nombre maximal de résultats d'une recherche plein texte (voir feed.search)
+SEARCH_RESULTS_LIMIT = 50
+
+# Images
+# Traitement des images des tickets (voir feed.images) : en arrière-plan par un pool de threads, ou dans la requête si
+# IMAGE_PROCESSING_ASYNC est faux
+IMAGE_PROCESSING_ASYNC = True
+IMAGE_PROCESSING_WORKERS = 2
+# Déclinaisons des images des tickets (voir feed.renditions) : taille maximale de chaque déclinaison et formats
+# produits, le dernier format étant celui proposé aux navigateurs ne prenant pas en charge les précédents
+IMAGE_RENDITIONS = {
+    "tile": (200, 200),
+    "tile_2x": (400, 400),
+    "preview": (64, 64),
+}
+IMAGE_RENDITION_FORMATS = ("webp", "jpg")
+# Limites des images déposées (voir feed.forms.TicketCreationForm) : nombre de pixels, vérifié avant tout décodage, et
+# taille du fichier en octets. La mémoire utilisée pour décoder une image est proportionnelle à son nombre de pixels
+IMAGE_MAX_PIXELS = 24_000_000
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Les fichiers déposés sont écrits sur le disque au fil de la réception plutôt que conservés en mémoire
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Users
+# Autocomplétion des noms d'utilisateur (voir users.autocomplete) : nombre de suggestions, intervalle minimal en
+# secondes entre deux lectures des utilisateurs nouvellement inscrits et entre deux rechargements complets de l'index
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REFRESH_INTERVAL = 1.0
+AUTOCOMPLETE_REBUILD_INTERVAL = 300.0
+
+# Graphe des abonnements en mémoire (voir users.follow_graph) : nombre maximal d'identifiants conservés (8 octets
+# chacun), durée de validité en secondes d'une liste d'adjacence et taille maximale d'une liste d'identifiants passée
+# en paramètre de requête, au-delà de laquelle une sous-requête est utilisée
+FOLLOW_GRAPH_MAX_EDGES = 1_000_000
+FOLLOW_GRAPH_TTL = 60.0
+FOLLOW_GRAPH_MAX_IN_LIST = 900
+
+# Suggestions d'abonnement (voir users.suggestions) : nombre de suggestions enregistrées et affichées par utilisateur,
+# nombre maximal d'abonnements parcourus par utilisateur intermédiaire, période d'activité prise en compte en jours et
+# taille des lots d'écriture
+FOLLOW_SUGGESTIONS_TOP_K = 20
+FOLLOW_SUGGESTIONS_DISPLAYED = 5
+FOLLOW_SUGGESTIONS_MAX_FANOUT = 1000
+FOLLOW_SUGGESTIONS_ACTIVITY_DAYS = 30
+FOLLOW_SUGGESTIONS_BATCH_SIZE = 5000
+
+# Abonnements en masse (voir users.bulk) : nombre maximal de noms par requête et taille des lots de lecture et
+# d'écriture, inférieure à la limite de paramètres par requête de SQLite
+BULK_FOLLOW_MAX_USERNAMES = 10_000
+BULK_FOLLOW_BATCH_SIZE = 900
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
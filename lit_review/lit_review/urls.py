@@ -1,17 +1,15 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.views.generic import RedirectView
 
+from main.views import serve_media
+
 urlpatterns = [
     path('', include('main.urls')),
     path('', include('users.urls')),
     path('', include('feed.urls')),
     path('admin/', admin.site.urls),
     path('favicon.ico', RedirectView.as_view(url='/media/lit_review/favicon.ico')),
+    re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,58 @@
+"""
+Profil de performance des connexions SQLite.
+
+Les pragmas de SQLITE_PRAGMAS sont appliqués à chaque connexion SQLite à sa création. Associés aux connexions
+persistantes (CONN_MAX_AGE), ils ne sont donc exécutés qu'une fois par connexion et non à chaque requête.
+
+Le mode WAL n'est activé que si SQLITE_WAL est vrai : contrairement aux autres pragmas, propres à chaque connexion, il
+est enregistré dans le fichier de la base. Il persiste alors après la fermeture de la connexion, et la base est
+accompagnée des fichiers <base>-wal et <base>-shm.
+"""
+from __future__ import annotations
+
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE = re.compile(r"^-?\d+$|^[A-Za-z]+$")
+WAL_PRAGMAS = {"journal_mode": "WAL"}
+
+
+def get_pragma_statements(pragmas: dict[str, str | int]) -> list[str]:
+    """
+    Retourne les instructions PRAGMA d'un profil, après vérification des noms et valeurs
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Pragma SQLite invalide : {name} = {value}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+def get_connection_pragmas(wal: bool | None = None) -> dict[str, str | int]:
+    """
+    Retourne les pragmas appliqués à chaque nouvelle connexion : ceux de SQLITE_PRAGMAS, précédés de l'activation du
+    mode WAL si wal (par défaut SQLITE_WAL) est vrai
+    """
+    if wal is None:
+        wal = settings.SQLITE_WAL
+    return {**WAL_PRAGMAS, **settings.SQLITE_PRAGMAS} if wal else dict(settings.SQLITE_PRAGMAS)
+
+
+def apply_pragmas(cursor, pragmas: dict[str, str | int]) -> None:
+    for statement in get_pragma_statements(pragmas):
+        cursor.execute(statement)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = get_connection_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.db import apply_pragmas, get_connection_pragmas
+
+# Délai laissé aux processus pour démarrer avant le début des mesures, en secondes
+START_DELAY = 0.5
+# Attente d'un verrou des connexions sans profil, comme celles ouvertes par défaut par Django
+DEFAULT_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE ticket (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    time_created REAL NOT NULL
+);
+CREATE INDEX ticket_user_time_idx ON ticket (user_id, time_created);
+"""
+
+
+def connect(path: str, pragmas: dict) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=DEFAULT_TIMEOUT, isolation_level=None)
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def create_database(path: str, pragmas: dict, rows: int, users: int) -> None:
+    connection = connect(path, pragmas)
+    connection.executescript(SCHEMA)
+    rng = random.Random(0)
+    with connection:
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO ticket (user_id, title, description, time_created) VALUES (?, ?, ?, ?)",
+            ((rng.randrange(users), "titre", "description " * 20, time.time()) for _ in range(rows)))
+    connection.close()
+
+
+def write(connection: sqlite3.Connection, rng: random.Random, users: int) -> None:
+    # Création d'un ticket dans une transaction, comme un enregistrement dans un bloc atomic
+    connection.execute("BEGIN")
+    try:
+        connection.execute("INSERT INTO ticket (user_id, title, description, time_created) VALUES (?, ?, ?, ?)",
+                           (rng.randrange(users), "titre", "description " * 20, time.time()))
+        connection.execute("COMMIT")
+    except sqlite3.OperationalError:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def read(connection: sqlite3.Connection, rng: random.Random, users: int) -> None:
+    # Page d'un flux : derniers tickets d'un ensemble d'utilisateurs suivis
+    followed = rng.sample(range(users), 20)
+    connection.execute(f"SELECT id, user_id, title, description FROM ticket "
+                       f"WHERE user_id IN ({', '.join('?' * len(followed))}) "
+                       f"ORDER BY time_created DESC LIMIT 20", followed).fetchall()
+
+
+def run_worker(path: str, pragmas: dict, persistent: bool, writer: bool, users: int, start_at: float,
+               deadline: float, seed: int, results) -> None:
+    """
+    Enchaîne les écritures ou les lectures jusqu'à l'échéance, puis transmet le nombre d'opérations réussies, le
+    nombre d'erreurs « database is locked » et les durées des opérations réussies
+    """
+    rng = random.Random(seed)
+    operation = write if writer else read
+    connection = connect(path, pragmas) if persistent else None
+    done = errors = 0
+    latencies = []
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            # Sans connexion persistante, chaque opération paie l'ouverture de la connexion et ses pragmas
+            current = connection or connect(path, pragmas)
+            try:
+                operation(current, rng, users)
+            finally:
+                if connection is None:
+                    current.close()
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        done += 1
+    if connection is not None:
+        connection.close()
+    results.put((writer, done, errors, latencies))
+
+
+class Command(BaseCommand):
+    """
+    Mesure le débit des lectures et écritures concurrentes sur une base SQLite temporaire, sans le profil puis avec le
+    profil SQLITE_PRAGMAS, avec une connexion par opération (CONN_MAX_AGE à 0) puis des connexions persistantes, et
+    enfin avec le profil en mode WAL (SQLITE_WAL).
+
+    Les lecteurs et les écrivains sont des processus distincts, chacun disposant de ses propres connexions, comme les
+    processus d'un serveur d'application.
+    """
+    help = "Benchmark des lectures et écritures concurrentes sur SQLite, avec et sans le profil SQLITE_PRAGMAS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help="Nombre de processus lecteurs")
+        parser.add_argument('--writers', type=int, default=4, help="Nombre de processus écrivains")
+        parser.add_argument('--duration', type=float, default=3.0, help="Durée de chaque mesure, en secondes")
+        parser.add_argument('--rows', type=int, default=50_000, help="Nombre de tickets initialement en base")
+        parser.add_argument('--users', type=int, default=1_000, help="Nombre d'auteurs des tickets")
+
+    def handle(self, *args, readers: int, writers: int, duration: float, rows: int, users: int, **options):
+        context = multiprocessing.get_context("fork")
+        scenarios = [
+            ("sans profil, connexion par opération", {}, False),
+            ("sans profil, connexions persistantes", {}, True),
+            ("profil, connexion par opération", get_connection_pragmas(wal=False), False),
+            ("profil, connexions persistantes", get_connection_pragmas(wal=False), True),
+            ("profil et WAL, connexions persistantes", get_connection_pragmas(wal=True), True),
+        ]
+        self.stdout.write(f"{readers} lecteurs, {writers} écrivains, {duration:.0f} s par mesure, {rows} tickets")
+        with tempfile.TemporaryDirectory() as directory:
+            for index, (label, pragmas, persistent) in enumerate(scenarios):
+                path = os.path.join(directory, f"bench_{index}.sqlite3")
+                create_database(path, pragmas, rows, users)
+
+                results = context.Queue()
+                start_at = time.time() + START_DELAY
+                workers = [context.Process(target=run_worker, args=(
+                    path, pragmas, persistent, number < writers, users, start_at, start_at + duration, number,
+                    results)) for number in range(readers + writers)]
+                for worker in workers:
+                    worker.start()
+                outcomes = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+                self.stdout.write(f"{label} :")
+                for writer, kind in ((False, "lectures"), (True, "écritures")):
+                    done = sum(outcome[1] for outcome in outcomes if outcome[0] is writer)
+                    errors = sum(outcome[2] for outcome in outcomes if outcome[0] is writer)
+                    latencies = sorted(latency for outcome in outcomes if outcome[0] is writer
+                                       for latency in outcome[3])
+                    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+                    self.stdout.write(f"  {kind:<9} : {done / duration:8.0f} /s, p99 {p99:7.2f} ms, "
+                                      f"{errors} erreurs « database is locked »")
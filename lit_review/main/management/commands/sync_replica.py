@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.replica import mark_synced
+
+
+class Command(BaseCommand):
+    """
+    Copie la base principale sur la copie REPLICA_DATABASE via l'API de sauvegarde de SQLite, puis enregistre la date
+    de la synchronisation, utilisée pour estimer le retard de la copie (voir main.replica).
+
+    La copie est faite en une étape : la base principale reste accessible en lecture, et en écriture en mode WAL
+    (SQLITE_WAL), les écritures attendant sinon la fin de la copie. Les lectures sur la copie attendent la fin de la
+    copie. Avec --interval, la synchronisation est répétée jusqu'à l'interruption de la commande, à un intervalle
+    devant rester inférieur à REPLICA_MAX_LAG.
+    """
+    help = "Synchronise la copie de la base de données avec la base principale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Répète la synchronisation toutes les N secondes")
+
+    def sync(self) -> float:
+        source, replica = connections["default"], connections[settings.REPLICA_DATABASE]
+        if source.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("La synchronisation de la copie n'est possible qu'entre deux bases SQLite")
+        # La copie reflète l'état de la base principale au début de la sauvegarde
+        synced_at = time.time()
+        source.ensure_connection()
+        replica.ensure_connection()
+        source.connection.backup(replica.connection)
+        mark_synced(synced_at)
+        return time.time() - synced_at
+
+    def handle(self, *args, interval: float | None, **options):
+        if interval is not None and interval >= settings.REPLICA_MAX_LAG:
+            self.stderr.write(f"L'intervalle dépasse REPLICA_MAX_LAG ({settings.REPLICA_MAX_LAG} s) : les lectures "
+                              f"seront en partie faites sur la base principale")
+        while True:
+            elapsed = self.sync()
+            self.stdout.write(f"Copie synchronisée en {elapsed * 1000:.0f} ms")
+            if interval is None:
+                return
+            time.sleep(max(interval - elapsed, 0))
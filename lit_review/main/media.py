@@ -0,0 +1,93 @@
+"""
+Service des fichiers de MEDIA_ROOT.
+
+Les réponses portent un ETag fort et une date Last-Modified : les requêtes conditionnelles obtiennent une réponse 304
+sans contenu. Les requêtes partielles (Range) reçoivent la plage d'octets demandée (206), ou une réponse 416 si la
+plage est hors du fichier.
+
+Si MEDIA_SENDFILE_HEADER est défini, l'envoi du contenu est délégué au serveur frontal (X-Sendfile pour Apache ou
+lighttpd, X-Accel-Redirect pour nginx) : le processus Django ne fait alors que vérifier le fichier et ses en-têtes.
+
+Les fichiers nommés d'après leur contenu (MEDIA_IMMUTABLE_PATTERN) sont mis en cache indéfiniment par les clients.
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from typing import IO, Iterator
+
+from django.conf import settings
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def get_etag(path: str, stat: os.stat_result) -> str:
+    """
+    Retourne l'ETag fort d'un fichier : son empreinte s'il est nommé d'après son contenu, sinon sa date de
+    modification et sa taille
+    """
+    if is_immutable(path):
+        return f'"{os.path.splitext(path)[0].replace("/", "-")}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def is_immutable(path: str) -> bool:
+    return re.fullmatch(settings.MEDIA_IMMUTABLE_PATTERN, path) is not None
+
+
+def get_cache_control(path: str) -> str:
+    if is_immutable(path):
+        return "public, max-age=31536000, immutable"
+    return f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+
+def get_content_type(path: str) -> str:
+    content_type, encoding = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Retourne la plage d'octets (début et fin inclus) désignée par un en-tête Range ne demandant qu'une plage
+
+    Retourne None si l'en-tête n'est pas une plage unique valide : le fichier est alors envoyé en entier. Lève une
+    ValueError si la plage est entièrement hors du fichier.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Plage suffixe : les last derniers octets
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file_range(file: IO[bytes], start: int, end: int) -> Iterator[bytes]:
+    """
+    Lit par blocs les octets de start à end inclus d'un fichier, puis le ferme
+    """
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
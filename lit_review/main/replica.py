@@ -0,0 +1,164 @@
+"""
+Lectures sur une copie de la base de données.
+
+Les lectures des requêtes GET et HEAD traitées par les vues de REPLICA_READ_VIEWS (flux, billets, recherche, page
+des abonnements) sont faites sur la copie REPLICA_DATABASE, toutes les écritures sur la base principale. Les vues
+elles-mêmes ne sont pas modifiées : ReplicaMiddleware choisit la base des lectures de chaque requête, que
+ReplicaRouter applique à l'ensemble des requêtes SQL, y compris celles faites via router.db_for_read.
+
+Les lectures sont faites sur la base principale :
+- après une écriture au cours de la même requête ;
+- pendant REPLICA_PIN_SECONDS après une requête ayant écrit en base, l'utilisateur retrouvant ainsi immédiatement
+  ses propres écritures (un cookie signé marque ce délai) ;
+- lorsque la copie a plus de REPLICA_MAX_LAG secondes de retard, ou n'a jamais été synchronisée.
+
+La copie est mise à jour par la commande sync_replica, qui enregistre la date de chaque synchronisation dans le
+fichier <copie>-synced.
+
+Les données conservées en cache au-delà de la requête ne sont jamais lues sur la copie : mises en cache après une
+invalidation, elles y resteraient en retard sur la base principale. Elles sont lues sur la base principale
+(read_from_primary), ou ne sont pas mises en cache lorsqu'elles ont été lues sur la copie (is_reading_replica).
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest, HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = "primary_pin"
+PIN_SALT = "main.replica.pin"
+SAFE_METHODS = ("GET", "HEAD")
+
+# Base des lectures de la requête en cours, None pour la base principale
+read_database: ContextVar[str | None] = ContextVar("read_database", default=None)
+# Indique si la requête en cours a écrit en base
+has_written: ContextVar[bool] = ContextVar("has_written", default=False)
+
+
+def is_reading_replica() -> bool:
+    """
+    Indique si les lectures de la requête en cours sont faites sur la copie
+    """
+    return read_database.get() is not None
+
+
+@contextmanager
+def read_from_primary() -> Iterator[None]:
+    """
+    Fait les lectures du bloc sur la base principale
+    """
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        # Une écriture faite dans le bloc dirige les lectures suivantes de la requête vers la base principale
+        if not has_written.get():
+            read_database.reset(token)
+
+
+def get_sync_marker_path() -> str:
+    return f"{settings.DATABASES[settings.REPLICA_DATABASE]['NAME']}-synced"
+
+
+def mark_synced(synced_at: float) -> None:
+    """
+    Enregistre la date de la dernière synchronisation de la copie
+    """
+    path = get_sync_marker_path()
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as marker:
+        marker.write(repr(synced_at))
+    os.replace(temporary_path, path)
+
+
+def get_replica_lag() -> float | None:
+    """
+    Retourne le retard, en secondes, de la copie sur la base principale, ou None si la copie n'a jamais été
+    synchronisée
+    """
+    try:
+        with open(get_sync_marker_path(), encoding="utf-8") as marker:
+            return time.time() - float(marker.read())
+    except (OSError, ValueError):
+        return None
+
+
+def is_replica_fresh() -> bool:
+    lag = get_replica_lag()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG
+
+
+def is_pinned(request: HttpRequest) -> bool:
+    """
+    Indique si l'utilisateur a écrit en base il y a moins de REPLICA_PIN_SECONDS
+    """
+    try:
+        request.get_signed_cookie(PIN_COOKIE, salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS)
+    except (KeyError, signing.BadSignature):
+        return False
+    return True
+
+
+def get_view_path(view_func) -> str:
+    return f"{view_func.__module__}.{view_func.__qualname__}"
+
+
+class ReplicaRouter:
+    """
+    Dirige les lectures vers la base choisie par ReplicaMiddleware pour la requête en cours, les écritures vers la
+    base principale
+    """
+
+    def db_for_read(self, model, **hints):
+        # Y compris pour les objets lus sur la copie, dont les objets liés seraient sinon lus sur la copie
+        return read_database.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        # Les lectures suivant une écriture doivent la retrouver
+        has_written.set(True)
+        read_database.set(None)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", settings.REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La copie reçoit le schéma de la base principale lors de sa synchronisation
+        return db != settings.REPLICA_DATABASE
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Choisit la base des lectures de chaque requête, et marque pendant REPLICA_PIN_SECONDS les utilisateurs ayant
+    écrit en base
+    """
+
+    def process_request(self, request: HttpRequest) -> None:
+        # Les valeurs de la requête précédente traitée par le même fil d'exécution ne doivent pas être reprises
+        read_database.set(None)
+        has_written.set(False)
+
+    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs) -> None:
+        if (request.method in SAFE_METHODS
+                and get_view_path(view_func) in settings.REPLICA_READ_VIEWS
+                and not is_pinned(request)
+                and is_replica_fresh()):
+            read_database.set(settings.REPLICA_DATABASE)
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        if has_written.get() or request.method not in SAFE_METHODS:
+            response.set_signed_cookie(PIN_COOKIE, "1", salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+                                       httponly=True, samesite="Lax")
+        read_database.set(None)
+        has_written.set(False)
+        return response
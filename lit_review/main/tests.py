@@ -0,0 +1,198 @@
+import os
+import time
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from feed.models import Ticket
+from users.follow_graph import follow_graph
+from users.models import UserFollows
+from .db import get_connection_pragmas, get_pragma_statements
+from .replica import PIN_COOKIE, get_sync_marker_path, mark_synced
+
+
+class SqlitePragmaTests(TestCase):
+    """
+    Profil SQLite appliqué aux connexions (voir main.db)
+    """
+
+    def test_connection_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS["busy_timeout"])
+
+    def test_wal_is_opt_in(self):
+        with override_settings(SQLITE_WAL=False):
+            self.assertNotIn("journal_mode", get_connection_pragmas())
+        with override_settings(SQLITE_WAL=True):
+            self.assertEqual(get_connection_pragmas()["journal_mode"], "WAL")
+
+
+class PragmaStatementTests(SimpleTestCase):
+
+    def test_invalid_pragmas_are_rejected(self):
+        for pragmas in ({"journal_mode; DROP TABLE auth_user": "WAL"}, {"journal_mode": "WAL; DROP TABLE auth_user"}):
+            with self.subTest(pragmas=pragmas), self.assertRaises(ValueError):
+                get_pragma_statements(pragmas)
+
+
+class MediaServeTests(SimpleTestCase):
+    """
+    Service des fichiers de MEDIA_ROOT (voir main.media)
+    """
+    content = b"0123456789"
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = os.path.join(directory.name, "media")
+        os.makedirs(os.path.join(media_root, "documents"))
+        with open(os.path.join(media_root, "documents", "file.txt"), "wb") as file:
+            file.write(self.content)
+        # Fichier hors de MEDIA_ROOT
+        with open(os.path.join(directory.name, "secret.txt"), "wb") as file:
+            file.write(b"secret")
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_SENDFILE_HEADER=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get(self, path: str = "documents/file.txt", **headers):
+        return self.client.get(f"{settings.MEDIA_URL}{path}", headers=headers)
+
+    def test_file_is_served_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertTrue(response.headers["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response.headers)
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+
+    def test_conditional_request_is_not_modified(self):
+        etag = self.get().headers["ETag"]
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_range_request_is_partial(self):
+        for header, content, content_range in (("bytes=2-4", b"234", "bytes 2-4/10"),
+                                               ("bytes=7-", b"789", "bytes 7-9/10"),
+                                               ("bytes=-2", b"89", "bytes 8-9/10"),
+                                               ("bytes=8-20", b"89", "bytes 8-9/10")):
+            with self.subTest(range=header):
+                response = self.get(range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b"".join(response.streaming_content), content)
+                self.assertEqual(response.headers["Content-Range"], content_range)
+
+    def test_unsatisfiable_range_is_rejected(self):
+        response = self.get(range="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["Content-Range"], "bytes */10")
+
+    def test_outdated_if_range_sends_whole_file(self):
+        response = self.get(range="bytes=2-4", if_range='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+    def test_path_traversal_is_rejected(self):
+        for path in ("../secret.txt", "documents/../../secret.txt", "%2e%2e/secret.txt", "/etc/passwd", "documents"):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).status_code, 404)
+
+
+class ReplicaTests(TransactionTestCase):
+    """
+    Lectures sur la copie de la base de données (voir main.replica)
+
+    La copie est synchronisée par la commande sync_replica, hors transaction : les tests ne peuvent donc pas être
+    exécutés dans une transaction annulée à leur issue.
+    """
+    databases = {"default", settings.REPLICA_DATABASE}
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        follow_graph.clear()
+        self.addCleanup(self.remove_sync_marker)
+        self.user = User.objects.create_user(username="reader", password="password")
+        Ticket.objects.create(title="Synchronisé", description="description", user=self.user)
+        self.client.force_login(self.user)
+        call_command("sync_replica", stdout=StringIO())
+        # Absent de la copie jusqu'à la prochaine synchronisation
+        Ticket.objects.create(title="Non synchronisé", description="description", user=self.user)
+
+    @staticmethod
+    def remove_sync_marker():
+        if os.path.exists(get_sync_marker_path()):
+            os.remove(get_sync_marker_path())
+
+    def get_posts(self):
+        """
+        Retourne la réponse de la page des contenus de l'utilisateur et les requêtes faites sur la copie
+        """
+        with CaptureQueriesContext(connections[settings.REPLICA_DATABASE]) as replica_queries:
+            response = self.client.get(reverse("feed:posts"))
+        self.assertEqual(response.status_code, 200)
+        return response, replica_queries
+
+    def test_reads_are_routed_to_fresh_replica(self):
+        response, replica_queries = self.get_posts()
+        self.assertTrue(any("feed_ticket" in query["sql"] for query in replica_queries))
+        self.assertContains(response, "Synchronisé")
+        self.assertNotContains(response, "Non synchronisé")
+
+    def test_reads_fall_back_to_primary_when_replica_is_stale(self):
+        mark_synced(time.time() - settings.REPLICA_MAX_LAG - 1)
+        response, replica_queries = self.get_posts()
+        self.assertEqual(len(replica_queries), 0)
+        self.assertContains(response, "Non synchronisé")
+
+    def test_writer_reads_own_writes_from_primary(self):
+        response = self.client.post(reverse("feed:ticket_creation"),
+                                    {"title": "Nouveau ticket", "description": "description"})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response, replica_queries = self.get_posts()
+        self.assertEqual(len(replica_queries), 0)
+        self.assertContains(response, "Nouveau ticket")
+
+        # Sans le cookie, les lectures sont de nouveau faites sur la copie
+        del self.client.cookies[PIN_COOKIE]
+        response, replica_queries = self.get_posts()
+        self.assertNotEqual(len(replica_queries), 0)
+        self.assertNotContains(response, "Nouveau ticket")
+
+    def test_pages_read_on_replica_are_not_cached(self):
+        with CaptureQueriesContext(connections[settings.REPLICA_DATABASE]) as replica_queries:
+            response = self.client.get(reverse("feed:home"))
+        self.assertTrue(any("feed_ticket" in query["sql"] for query in replica_queries))
+        self.assertNotContains(response, "Non synchronisé")
+
+        # Le feed ne conserve pas la page lue sur la copie en retard
+        call_command("sync_replica", stdout=StringIO())
+        self.assertContains(self.client.get(reverse("feed:home")), "Non synchronisé")
+
+    def test_follow_graph_is_loaded_from_primary(self):
+        author = User.objects.create_user(username="author", password="password")
+        UserFollows.objects.create(user=self.user, followed_user=author)
+        follow_graph.clear()
+
+        self.assertEqual(self.client.get(reverse("feed:home")).status_code, 200)
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [author.pk])
+
+    def test_authenticated_user_is_read_from_primary(self):
+        # Absent de la copie : la session, ouverte avec l'ancien mot de passe, n'est plus valide
+        self.user.set_password("new password")
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("feed:home")).status_code, 302)
@@ -1,5 +1,16 @@
-from django.http import HttpRequest
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpRequest, HttpResponse, HttpResponseBase,
+                         StreamingHttpResponse)
 from django.shortcuts import redirect
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .media import get_cache_control, get_content_type, get_etag, iter_file_range, parse_range
 
 
 def homepage(request: HttpRequest):
@@ -10,3 +21,79 @@ def homepage(request: HttpRequest):
     if request.user.is_authenticated:
         return redirect("feed:home")
     return redirect("users:authentication_page")
+
+
+def is_if_range_satisfied(request: HttpRequest, etag: str, last_modified: int) -> bool:
+    """
+    Indique si la plage demandée peut être envoyée : l'en-tête If-Range, s'il est présent, doit correspondre à la
+    version actuelle du fichier
+    """
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve_media(request: HttpRequest, path: str) -> HttpResponseBase:
+    """
+    Sert un fichier de MEDIA_ROOT (voir main.media)
+
+    Reçoit une requête GET ou HEAD et le chemin du fichier relatif à MEDIA_ROOT :
+        Répond 304 si la version du client est à jour
+        Délègue l'envoi au serveur frontal si MEDIA_SENDFILE_HEADER est défini
+        Envoie la plage demandée (206), une erreur 416 si elle est hors du fichier, ou le fichier entier
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("Fichier introuvable")
+    if not os.path.isfile(full_path):
+        raise Http404("Fichier introuvable")
+
+    etag = get_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {"ETag": etag,
+               "Last-Modified": http_date(last_modified),
+               "Cache-Control": get_cache_control(path),
+               "Accept-Ranges": "bytes"}
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_file_response(request, path, full_path, stat.st_size, etag, last_modified)
+    for header, value in headers.items():
+        response.headers.setdefault(header, value)
+    return response
+
+
+def get_file_response(request: HttpRequest,
+                      path: str,
+                      full_path: str,
+                      size: int,
+                      etag: str,
+                      last_modified: int) -> HttpResponseBase:
+    content_type = get_content_type(path)
+    if settings.MEDIA_SENDFILE_HEADER == "X-Sendfile":
+        return HttpResponse(content_type=content_type, headers={"X-Sendfile": full_path})
+    if settings.MEDIA_SENDFILE_HEADER == "X-Accel-Redirect":
+        return HttpResponse(content_type=content_type,
+                            headers={"X-Accel-Redirect": settings.MEDIA_ACCEL_REDIRECT_PREFIX + path})
+
+    range_header = request.headers.get("Range")
+    if range_header and is_if_range_satisfied(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return HttpResponse(status=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_file_range(open(full_path, "rb"), start, end),
+                                             status=206, content_type=content_type)
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response.headers["Content-Length"] = str(end - start + 1)
+            return response
+
+    return FileResponse(open(full_path, "rb"), content_type=content_type)
@@ -0,0 +1,85 @@
+"""
+Cache de l'utilisateur authentifié.
+
+Sans cache, chaque requête authentifiée charge l'utilisateur depuis la base de données. L'utilisateur résolu est ici
+conservé AUTH_USER_CACHE_TIMEOUT secondes dans le cache AUTH_USER_CACHE_ALIAS : associé à une session lue depuis le
+cache (SESSION_ENGINE cached_db) ou depuis un cookie signé (signed_cookies), l'authentification d'une requête ne
+nécessite alors aucune requête en base.
+
+La session reste vérifiée à chaque requête contre l'empreinte du mot de passe de l'utilisateur en cache. L'entrée en
+cache d'un utilisateur est supprimée à chaque enregistrement ou suppression de l'utilisateur (changement de mot de
+passe, désactivation) et à sa déconnexion (voir users.signals) : ses sessions antérieures à un changement de mot de
+passe sont alors invalidées dès la requête suivante.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.http import HttpRequest
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from main.replica import read_from_primary
+
+
+def get_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def _user_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+def invalidate_user(user_id: int) -> None:
+    get_cache().delete(_user_key(user_id))
+
+
+def get_cached_user(request: HttpRequest) -> User | AnonymousUser:
+    """
+    Retourne l'utilisateur de la session de la requête, depuis le cache lorsqu'il y est présent
+
+    En cas d'absence du cache ou d'empreinte de session ne correspondant pas à l'utilisateur en cache, l'utilisateur
+    est résolu par django.contrib.auth.get_user, qui vide le cas échéant la session.
+    """
+    if settings.AUTH_USER_CACHE_TIMEOUT <= 0:
+        return auth.get_user(request)
+    try:
+        user_id = User._meta.pk.to_python(request.session[auth.SESSION_KEY])
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    cache = get_cache()
+    user = cache.get(_user_key(user_id))
+    if user is not None:
+        session_hash = request.session.get(auth.HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            return user
+
+    # L'utilisateur mis en cache n'est pas lu sur la copie (voir main.replica)
+    with read_from_primary():
+        user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(_user_key(user_id), user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def get_user(request: HttpRequest) -> User | AnonymousUser:
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = get_cached_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware résolvant l'utilisateur de la requête depuis le cache de l'utilisateur authentifié
+    """
+
+    def process_request(self, request: HttpRequest) -> None:
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,122 @@
+"""
+Index trié en mémoire des noms d'utilisateur, utilisé pour l'autocomplétion du formulaire d'abonnement.
+
+Les noms d'utilisateur sont conservés triés par leur forme normalisée (casefold) : les noms commençant par un préfixe
+forment une tranche contiguë de l'index, trouvée par recherche dichotomique.
+
+L'index est chargé à la première recherche puis complété de façon incrémentale :
+    - immédiatement, par le signal d'enregistrement d'un nouvel utilisateur dans le processus courant ;
+    - au plus toutes les AUTOCOMPLETE_REFRESH_INTERVAL secondes, par la lecture des utilisateurs inscrits depuis le
+    dernier chargement, pour les inscriptions traitées par d'autres processus.
+
+Les suppressions et renommages traités par d'autres processus ne sont pas visibles de façon incrémentale : l'index est
+intégralement rechargé au plus toutes les AUTOCOMPLETE_REBUILD_INTERVAL secondes.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+
+class UsernameIndex:
+    """
+    Index trié des noms d'utilisateur, sous forme de couples (nom normalisé, nom d'utilisateur)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Sérialise les actualisations, afin qu'un seul thread à la fois lise les utilisateurs en base
+        self._refresh_lock = threading.Lock()
+        self._entries: list[tuple[str, str]] = []
+        self._last_pk: int | None = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+
+    def load(self, usernames: Iterable[str]) -> None:
+        """
+        Remplace le contenu de l'index par les noms d'utilisateur reçus
+        """
+        entries = sorted((username.casefold(), username) for username in usernames)
+        with self._lock:
+            self._entries = entries
+
+    def add(self, username: str) -> None:
+        with self._lock:
+            entry = (username.casefold(), username)
+            position = bisect_left(self._entries, entry)
+            if position == len(self._entries) or self._entries[position] != entry:
+                insort(self._entries, entry)
+
+    def remove(self, username: str) -> None:
+        with self._lock:
+            entry = (username.casefold(), username)
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def refresh(self) -> None:
+        """
+        Charge l'index à la première utilisation, puis y ajoute les utilisateurs inscrits depuis le dernier
+        chargement, au plus toutes les AUTOCOMPLETE_REFRESH_INTERVAL secondes, et le recharge intégralement au plus
+        toutes les AUTOCOMPLETE_REBUILD_INTERVAL secondes
+
+        Un seul thread actualise l'index : tant que l'index est chargé, les autres threads n'attendent pas la fin de
+        l'actualisation et utilisent l'index courant.
+        """
+        if not self._is_refresh_due(time.monotonic()):
+            return
+        if not self._refresh_lock.acquire(blocking=self._last_pk is None):
+            return
+        try:
+            now = time.monotonic()
+            if not self._is_refresh_due(now):
+                return
+            self._refreshed_at = now
+
+            if self._last_pk is None or now - self._rebuilt_at >= settings.AUTOCOMPLETE_REBUILD_INTERVAL:
+                users = list(User.objects.order_by('pk').values_list('pk', 'username'))
+                self.load(username for _, username in users)
+                self._rebuilt_at = now
+                self._last_pk = users[-1][0] if users else 0
+            else:
+                users = list(User.objects.filter(pk__gt=self._last_pk).order_by('pk').values_list('pk', 'username'))
+                for _, username in users:
+                    self.add(username)
+                if users:
+                    self._last_pk = users[-1][0]
+        finally:
+            self._refresh_lock.release()
+
+    def _is_refresh_due(self, now: float) -> bool:
+        return self._last_pk is None or now - self._refreshed_at >= settings.AUTOCOMPLETE_REFRESH_INTERVAL
+
+    def complete(self, prefix: str, limit: int) -> list[str]:
+        """
+        Retourne, dans l'ordre alphabétique, au plus limit noms d'utilisateur commençant par le préfixe, sans tenir
+        compte de la casse
+        """
+        prefix = prefix.casefold()
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            matches = []
+            for key, username in self._entries[position:position + limit]:
+                if not key.startswith(prefix):
+                    break
+                matches.append(username)
+        return matches
+
+
+username_index = UsernameIndex()
+
+
+def complete_username(prefix: str, limit: int | None = None) -> list[str]:
+    """
+    Retourne les noms d'utilisateur commençant par le préfixe, l'index étant préalablement actualisé
+    """
+    username_index.refresh()
+    return username_index.complete(prefix, limit or settings.AUTOCOMPLETE_LIMIT)
@@ -0,0 +1,122 @@
+"""
+Abonnements et désabonnements en masse à partir d'une liste de noms d'utilisateur.
+
+Les noms sont résolus par lots de BULK_FOLLOW_BATCH_SIZE en une requête IN par lot, et les abonnements sont écrits
+par lots dans une transaction. Les abonnements créés par bulk_create n'envoient pas de signal post_save : le signal
+follows_bulk_created (voir users.signals) le remplace, une seule fois pour l'ensemble des utilisateurs suivis. Les
+abonnements supprimés envoient leurs signaux post_delete habituels.
+
+Chaque nom reçu obtient un résultat :
+    - FOLLOWED / UNFOLLOWED : l'abonnement a été créé / supprimé ;
+    - ALREADY_FOLLOWED / NOT_FOLLOWED : l'abonnement existait déjà / n'existait pas ;
+    - UNKNOWN : aucun utilisateur ne porte ce nom ;
+    - SELF : le nom est celui de l'utilisateur lui-même.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import UserFollows
+from .signals import follows_bulk_created
+
+FOLLOWED = "followed"
+ALREADY_FOLLOWED = "already_followed"
+UNFOLLOWED = "unfollowed"
+NOT_FOLLOWED = "not_followed"
+UNKNOWN = "unknown"
+SELF = "self"
+
+
+def iter_batches(values: list, batch_size: int) -> Iterator[list]:
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+def clean_usernames(usernames: Iterable[str]) -> list[str]:
+    """
+    Retourne les noms d'utilisateur reçus sans espaces superflus, sans doublons ni noms vides, dans l'ordre reçu
+    """
+    return list(dict.fromkeys(name for name in (username.strip() for username in usernames) if name))
+
+
+def resolve_usernames(usernames: list[str]) -> dict[str, int]:
+    """
+    Retourne l'identifiant de chacun des noms d'utilisateur existants
+    """
+    users_id = {}
+    for batch in iter_batches(usernames, settings.BULK_FOLLOW_BATCH_SIZE):
+        users_id.update(User.objects.filter(username__in=batch).values_list('username', 'pk'))
+    return users_id
+
+
+def get_existing_follows(user: User, users_id: list[int]) -> set[int]:
+    """
+    Retourne, parmi les identifiants reçus, ceux des utilisateurs déjà suivis par l'utilisateur
+    """
+    followed = set()
+    for batch in iter_batches(users_id, settings.BULK_FOLLOW_BATCH_SIZE):
+        followed.update(UserFollows.objects.filter(user=user, followed_user__in=batch).values_list(
+            'followed_user', flat=True))
+    return followed
+
+
+def bulk_follow(user: User, usernames: Iterable[str]) -> dict[str, str]:
+    """
+    Abonne l'utilisateur à chacun des utilisateurs nommés, retourne le résultat obtenu pour chaque nom
+    """
+    usernames = clean_usernames(usernames)
+    users_id = resolve_usernames(usernames)
+    report = {}
+    with transaction.atomic():
+        existing = get_existing_follows(user, list(users_id.values()))
+        created = []
+        for username in usernames:
+            followed_user_id = users_id.get(username)
+            if followed_user_id is None:
+                report[username] = UNKNOWN
+            elif followed_user_id == user.pk:
+                report[username] = SELF
+            elif followed_user_id in existing:
+                report[username] = ALREADY_FOLLOWED
+            else:
+                report[username] = FOLLOWED
+                created.append(followed_user_id)
+
+        # Les abonnements créés entre-temps par une autre requête sont ignorés plutôt que de lever une IntegrityError
+        UserFollows.objects.bulk_create(
+            (UserFollows(user=user, followed_user_id=followed_user_id) for followed_user_id in created),
+            batch_size=settings.BULK_FOLLOW_BATCH_SIZE, ignore_conflicts=True)
+        if created:
+            follows_bulk_created.send(sender=UserFollows, user_id=user.pk, followed_users_id=created)
+    return report
+
+
+def bulk_unfollow(user: User, usernames: Iterable[str]) -> dict[str, str]:
+    """
+    Désabonne l'utilisateur de chacun des utilisateurs nommés, retourne le résultat obtenu pour chaque nom
+    """
+    usernames = clean_usernames(usernames)
+    users_id = resolve_usernames(usernames)
+    report = {}
+    with transaction.atomic():
+        existing = get_existing_follows(user, list(users_id.values()))
+        deleted = []
+        for username in usernames:
+            followed_user_id = users_id.get(username)
+            if followed_user_id is None:
+                report[username] = UNKNOWN
+            elif followed_user_id == user.pk:
+                report[username] = SELF
+            elif followed_user_id not in existing:
+                report[username] = NOT_FOLLOWED
+            else:
+                report[username] = UNFOLLOWED
+                deleted.append(followed_user_id)
+
+        for batch in iter_batches(deleted, settings.BULK_FOLLOW_BATCH_SIZE):
+            UserFollows.objects.filter(user=user, followed_user__in=batch).delete()
+    return report
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_login_required(view):
+    """
+    Équivalent de login_required pour les vues asynchrones
+
+    L'utilisateur de la requête est chargé depuis la session et la base de données hors de la boucle d'événements :
+    il est ensuite disponible sans requête dans la vue.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,184 @@
+"""
+Cache en mémoire du graphe des abonnements.
+
+Pour chaque utilisateur consulté, les identifiants des utilisateurs suivis et des abonnés sont conservés sous forme de
+tableaux d'entiers triés (array('q'), 8 octets par identifiant) :
+    - chargés à la première consultation depuis UserFollows, sur la base principale même lorsque les lectures de la
+    requête sont faites sur la copie (voir main.replica) ;
+    - mis à jour de façon incrémentale, une fois la transaction validée, par les signaux d'enregistrement et de
+    suppression des abonnements ;
+    - rechargés après FOLLOW_GRAPH_TTL secondes, pour prendre en compte les abonnements enregistrés par d'autres
+    processus ;
+    - évincés, les moins récemment consultés en premier, lorsque le nombre total d'identifiants conservés dépasse
+    FOLLOW_GRAPH_MAX_EDGES.
+
+Les tableaux conservés ne sont jamais modifiés : chaque mise à jour remplace le tableau d'un utilisateur par une copie
+modifiée. Un tableau retourné est ainsi un instantané, qui ne doit pas être modifié par l'appelant.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from main.replica import read_from_primary
+from .models import UserFollows
+
+
+class AdjacencyCache:
+    """
+    Listes d'adjacence triées d'un sens du graphe des abonnements, avec éviction LRU
+    """
+
+    def __init__(self, source_field: str, target_field: str):
+        self.source_field = source_field
+        self.target_field = target_field
+        self._lock = threading.RLock()
+        self._entries: OrderedDict[int, tuple[float, array]] = OrderedDict()
+        self._size = 0
+        # Incrémenté à chaque mise à jour : une liste chargée pendant une mise à jour n'est pas mise en cache
+        self._generation = 0
+
+    def _load(self, user_id: int) -> array:
+        with read_from_primary():
+            return array('q', UserFollows.objects.filter(**{self.source_field: user_id}).order_by(
+                self.target_field).values_list(self.target_field, flat=True))
+
+    def get(self, user_id: int) -> array:
+        """
+        Retourne les identifiants triés adjacents à l'utilisateur, depuis le cache ou la base de données
+
+        La base de données est lue hors du verrou : le chargement d'une liste ne bloque pas les autres consultations.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] < settings.FOLLOW_GRAPH_TTL:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            generation = self._generation
+
+        adjacency = self._load(user_id)
+        with self._lock:
+            if generation == self._generation:
+                self._discard(user_id)
+                self._entries[user_id] = (time.monotonic(), adjacency)
+                self._size += len(adjacency)
+                self._evict()
+        return adjacency
+
+    def add(self, user_id: int, target_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            loaded_at, adjacency = entry
+            position = bisect_left(adjacency, target_id)
+            if position == len(adjacency) or adjacency[position] != target_id:
+                adjacency = array('q', adjacency)
+                adjacency.insert(position, target_id)
+                self._entries[user_id] = (loaded_at, adjacency)
+                self._size += 1
+                self._evict()
+
+    def remove(self, user_id: int, target_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            loaded_at, adjacency = entry
+            position = bisect_left(adjacency, target_id)
+            if position < len(adjacency) and adjacency[position] == target_id:
+                adjacency = array('q', adjacency)
+                del adjacency[position]
+                self._entries[user_id] = (loaded_at, adjacency)
+                self._size -= 1
+
+    def _discard(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def _evict(self) -> None:
+        # L'entrée la plus récemment consultée est conservée, même si elle dépasse à elle seule la limite
+        while self._size > settings.FOLLOW_GRAPH_MAX_EDGES and len(self._entries) > 1:
+            _, (_, adjacency) = self._entries.popitem(last=False)
+            self._size -= len(adjacency)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._size = 0
+
+
+class FollowGraph:
+    """
+    Graphe des abonnements : utilisateurs suivis (arcs sortants) et abonnés (arcs entrants) de chaque utilisateur
+    """
+
+    def __init__(self):
+        self._followed = AdjacencyCache('user', 'followed_user')
+        self._followers = AdjacencyCache('followed_user', 'user')
+
+    def followed(self, user_id: int) -> array:
+        """
+        Retourne les identifiants triés des utilisateurs suivis par l'utilisateur
+        """
+        return self._followed.get(user_id)
+
+    def followers(self, user_id: int) -> array:
+        """
+        Retourne les identifiants triés des utilisateurs abonnés à l'utilisateur
+        """
+        return self._followers.get(user_id)
+
+    def add_follow(self, user_id: int, followed_user_id: int) -> None:
+        self._followed.add(user_id, followed_user_id)
+        self._followers.add(followed_user_id, user_id)
+
+    def remove_follow(self, user_id: int, followed_user_id: int) -> None:
+        self._followed.remove(user_id, followed_user_id)
+        self._followers.remove(followed_user_id, user_id)
+
+    def clear(self) -> None:
+        self._followed.clear()
+        self._followers.clear()
+
+
+follow_graph = FollowGraph()
+
+
+def as_in_filter(adjacency: array, fallback: QuerySet) -> list[int] | QuerySet:
+    """
+    Retourne les identifiants d'une liste d'adjacence sous une forme utilisable dans un filtre __in
+
+    Au-delà de FOLLOW_GRAPH_MAX_IN_LIST identifiants, la sous-requête reçue est utilisée plutôt qu'une liste de
+    paramètres de requête.
+    """
+    if len(adjacency) > settings.FOLLOW_GRAPH_MAX_IN_LIST:
+        return fallback
+    return adjacency.tolist()
+
+
+def get_followed_id(user_id: int) -> list[int] | QuerySet:
+    """
+    Reçoit un user_id et retourne les identifiants des utilisateurs qu'il suit, utilisables dans un filtre __in
+    """
+    return as_in_filter(follow_graph.followed(user_id),
+                        UserFollows.objects.filter(user=user_id).values('followed_user'))
+
+
+def get_followers_id(user_id: int) -> list[int] | QuerySet:
+    """
+    Reçoit un user_id et retourne les identifiants des utilisateurs qui y sont abonnés, utilisables dans un filtre
+    __in
+    """
+    return as_in_filter(follow_graph.followers(user_id),
+                        UserFollows.objects.filter(followed_user=user_id).values('user'))
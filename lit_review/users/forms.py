@@ -9,12 +9,16 @@ class UserSearchInput(forms.Form):
     """
     Permet la recherche d'utilisateurs enregistrés dans la bdd.
 
-    Requiert un nom d'utilisateur.
+    Requiert un nom d'utilisateur, des suggestions sont proposées au fil de la saisie.
     """
     user_name = forms.CharField(max_length=100,
                                 error_messages={'required': 'You need to enter a username to follow'},
                                 widget=forms.TextInput(
-                                    attrs=DEFAULT_TEXT_INPUT_ATTRS))
+                                    attrs={
+                                        **DEFAULT_TEXT_INPUT_ATTRS,
+                                        "list": "username-suggestions",
+                                        "autocomplete": "off",
+                                    }))
 
 
 class UserAuthenticationForm(AuthenticationForm):
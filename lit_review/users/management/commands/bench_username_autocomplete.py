@@ -0,0 +1,49 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.autocomplete import UsernameIndex
+
+
+class Command(BaseCommand):
+    """
+    Mesure la latence de l'autocomplétion des noms d'utilisateur sur un index de noms synthétiques, sans accès à la
+    base de données du projet.
+    """
+    help = "Benchmark de l'autocomplétion des noms d'utilisateur (p50, p99)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Nombre de noms d'utilisateur indexés")
+        parser.add_argument('--queries', type=int, default=10_000, help="Nombre de recherches mesurées")
+        parser.add_argument('--limit', type=int, default=10, help="Nombre de suggestions par recherche")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, users: int, queries: int, limit: int, seed: int, **options):
+        rng = random.Random(seed)
+        alphabet = string.ascii_letters + string.digits + "_"
+        usernames = {"".join(rng.choices(alphabet, k=rng.randint(4, 16))) for _ in range(users)}
+
+        index = UsernameIndex()
+        start = time.perf_counter()
+        index.load(usernames)
+        self.stdout.write(f"Chargement : {len(usernames)} noms en {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        for username in rng.sample(sorted(usernames), min(1000, len(usernames))):
+            index.remove(username)
+            index.add(username)
+        self.stdout.write(f"Mise à jour incrémentale : {(time.perf_counter() - start) * 1000 / 2000:.3f} ms")
+
+        latencies = []
+        for _ in range(queries):
+            prefix = "".join(rng.choices(alphabet, k=rng.randint(1, 4)))
+            start = time.perf_counter()
+            index.complete(prefix, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        self.stdout.write(f"Autocomplétion : p50 {latencies[len(latencies) // 2]:.3f} ms, "
+                          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.3f} ms, "
+                          f"max {latencies[-1]:.3f} ms")
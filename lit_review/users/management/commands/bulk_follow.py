@@ -0,0 +1,44 @@
+import sys
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk import bulk_follow, bulk_unfollow
+
+
+class Command(BaseCommand):
+    """
+    Abonne (ou désabonne) un utilisateur à une liste d'utilisateurs lue depuis un fichier, un nom par ligne.
+    """
+    help = "Abonne un utilisateur à une liste de noms d'utilisateur et affiche le résultat obtenu pour chaque nom"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="Nom de l'utilisateur abonné")
+        parser.add_argument('--file', default=None,
+                            help="Fichier des noms d'utilisateur à suivre, un par ligne (entrée standard par défaut)")
+        parser.add_argument('--unfollow', action='store_true', help="Désabonne l'utilisateur plutôt que de l'abonner")
+        parser.add_argument('--quiet', action='store_true', help="N'affiche que le nombre de noms par résultat")
+
+    def handle(self, *args, username: str, file: str | None, unfollow: bool, quiet: bool, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"L'utilisateur {username} n'existe pas")
+
+        if file is None:
+            usernames = sys.stdin.read().splitlines()
+        else:
+            with open(file, encoding="utf-8") as usernames_file:
+                usernames = usernames_file.read().splitlines()
+
+        start = time.perf_counter()
+        results = (bulk_unfollow if unfollow else bulk_follow)(user, usernames)
+        elapsed = time.perf_counter() - start
+
+        if not quiet:
+            for name, outcome in results.items():
+                self.stdout.write(f"{name}\t{outcome}")
+        counts = ", ".join(f"{outcome} : {count}" for outcome, count in Counter(results.values()).items())
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} noms traités en {elapsed:.3f} s ({counts})"))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.suggestions import compute_follow_suggestions
+
+
+class Command(BaseCommand):
+    """
+    Recalcule les suggestions d'abonnement de l'ensemble des utilisateurs, à exécuter périodiquement.
+    """
+    help = "Calcule et enregistre les suggestions d'abonnement de chaque utilisateur"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None,
+                            help="Nombre de suggestions enregistrées par utilisateur")
+        parser.add_argument('--max-fanout', type=int, default=None,
+                            help="Nombre maximal d'abonnements parcourus par utilisateur intermédiaire")
+        parser.add_argument('--activity-days', type=int, default=None,
+                            help="Période d'activité récente prise en compte, en jours")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Nombre de processus (tous les cœurs par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Nombre d'utilisateurs traités par tâche et par transaction")
+
+    def handle(self, *args, top_k, max_fanout, activity_days, workers, chunk_size: int, **options):
+        start = time.perf_counter()
+        users, written = compute_follow_suggestions(top_k=top_k, max_fanout=max_fanout, activity_days=activity_days,
+                                                    workers=workers, chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} suggestions enregistrées pour {users} utilisateurs en {time.perf_counter() - start:.1f} s"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFollows',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('followed_user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='followed_by',
+                    to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='following',
+                    to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'followed_user')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_follows_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('mutual_count', models.PositiveIntegerField()),
+                ('time_computed', models.DateTimeField()),
+                ('suggested_user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                    to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions',
+                    to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score'], name='follow_suggestion_score_idx')],
+                'unique_together': {('user', 'suggested_user')},
+            },
+        ),
+    ]
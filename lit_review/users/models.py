@@ -15,6 +15,34 @@ class UserFollows(models.Model):
 
     class Meta:
         """
-        S'assure que chaque couple utilisateur abonné/utilisateur suivi est unique
+        S'assure que chaque couple utilisateur abonné/utilisateur suivi est unique, ce qui indexe les abonnements d'un
+        utilisateur, et indexe les abonnés d'un utilisateur
         """
         unique_together = ('user', 'followed_user',)
+        indexes = [
+            models.Index(fields=['followed_user', 'user'], name='follows_followed_user_idx'),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """
+    Suggestion d'abonnement précalculée (voir users.suggestions).
+    """
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             related_name='follow_suggestions')
+    suggested_user = models.ForeignKey(to=settings.AUTH_USER_MODEL,
+                                       on_delete=models.CASCADE,
+                                       related_name='+')
+    score = models.FloatField()
+    mutual_count = models.PositiveIntegerField()
+    time_computed = models.DateTimeField()
+
+    class Meta:
+        """
+        Indexe les suggestions d'un utilisateur par score décroissant
+        """
+        unique_together = ('user', 'suggested_user',)
+        indexes = [
+            models.Index(fields=['user', '-score'], name='follow_suggestion_score_idx'),
+        ]
@@ -0,0 +1,78 @@
+"""
+Réception des signaux d'inscription et de suppression des utilisateurs et des abonnements.
+"""
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from . import auth
+from .autocomplete import username_index
+from .follow_graph import follow_graph
+from .models import UserFollows
+
+# Envoyé par users.bulk.bulk_follow à la place des signaux post_save des abonnements créés en masse, avec les arguments
+# user_id (l'abonné) et followed_users_id (les identifiants des utilisateurs nouvellement suivis)
+follows_bulk_created = Signal()
+
+
+@receiver(post_save, sender=User)
+def on_user_saved(sender, instance: User, created: bool, **kwargs):
+    """
+    Ajoute un nouvel utilisateur à l'index d'autocomplétion des noms d'utilisateur.
+
+    Retire un utilisateur modifié (mot de passe, activation) du cache de l'utilisateur authentifié
+    """
+    if created:
+        username_index.add(instance.username)
+    else:
+        auth.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def on_user_deleted(sender, instance: User, **kwargs):
+    """
+    Retire un utilisateur supprimé de l'index d'autocomplétion des noms d'utilisateur et du cache de l'utilisateur
+    authentifié
+    """
+    username_index.remove(instance.username)
+    auth.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def on_user_logged_out(sender, request, user: User | None, **kwargs):
+    """
+    Retire un utilisateur déconnecté (voir users.views.logout_user) du cache de l'utilisateur authentifié
+    """
+    if user is not None:
+        auth.invalidate_user(user.pk)
+
+
+@receiver(post_save, sender=UserFollows)
+def on_follow_saved(sender, instance: UserFollows, created: bool, **kwargs):
+    """
+    Ajoute un nouvel abonnement au graphe des abonnements en mémoire, une fois la transaction validée
+    """
+    if created:
+        transaction.on_commit(lambda: follow_graph.add_follow(instance.user_id, instance.followed_user_id))
+
+
+@receiver(follows_bulk_created, sender=UserFollows)
+def on_follows_bulk_created(sender, user_id: int, followed_users_id: list[int], **kwargs):
+    """
+    Ajoute des abonnements créés en masse au graphe des abonnements en mémoire, une fois la transaction validée
+    """
+    def add_follows():
+        for followed_user_id in followed_users_id:
+            follow_graph.add_follow(user_id, followed_user_id)
+
+    transaction.on_commit(add_follows)
+
+
+@receiver(post_delete, sender=UserFollows)
+def on_follow_deleted(sender, instance: UserFollows, **kwargs):
+    """
+    Retire un abonnement supprimé du graphe des abonnements en mémoire, une fois la transaction validée
+    """
+    transaction.on_commit(lambda: follow_graph.remove_follow(instance.user_id, instance.followed_user_id))
@@ -0,0 +1,206 @@
+"""
+Suggestions d'abonnement ("Vous connaissez peut-être") calculées à partir du graphe des abonnements.
+
+Les candidats d'un utilisateur sont les utilisateurs suivis par les utilisateurs qu'il suit (à deux sauts), à
+l'exception de lui-même et des utilisateurs qu'il suit déjà. Chaque candidat est classé selon :
+    - le nombre d'utilisateurs suivis en commun menant à lui ;
+    - son activité récente (tickets et reviews publiés sur les FOLLOW_SUGGESTIONS_ACTIVITY_DAYS derniers jours).
+
+Le calcul est un traitement par lots (commande compute_follow_suggestions) :
+    - l'ensemble de la table UserFollows est chargé sous forme de matrice d'adjacence creuse (CSR) en tableaux NumPy ;
+    - les utilisateurs sont répartis par tranches entre plusieurs processus, qui héritent des tableaux par fork ;
+    - les k meilleures suggestions de chaque utilisateur sont enregistrées dans la table FollowSuggestion, d'où elles
+    sont servies sur la page de gestion des abonnements.
+"""
+from __future__ import annotations
+
+import multiprocessing
+from datetime import timedelta
+from typing import Iterator, NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from feed.models import Ticket, Review
+from .models import UserFollows, FollowSuggestion
+
+FETCH_SIZE = 100_000
+
+
+class FollowGraphArrays(NamedTuple):
+    """
+    Graphe des abonnements sous forme CSR : les utilisateurs sont numérotés de 0 à n - 1 dans l'ordre de user_ids, les
+    indices des utilisateurs suivis par l'utilisateur i sont indices[indptr[i]:indptr[i + 1]], triés
+    """
+    user_ids: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+
+
+def build_graph(follower_ids: np.ndarray, followed_ids: np.ndarray) -> FollowGraphArrays:
+    """
+    Construit le graphe CSR à partir des couples (abonné, utilisateur suivi)
+    """
+    user_ids = np.unique(np.concatenate([follower_ids, followed_ids]))
+    sources = np.searchsorted(user_ids, follower_ids)
+    targets = np.searchsorted(user_ids, followed_ids)
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(user_ids)), out=indptr[1:])
+    return FollowGraphArrays(user_ids, indptr, targets[order].astype(np.int64))
+
+
+def load_graph(using: str | None = None) -> FollowGraphArrays:
+    """
+    Charge l'intégralité de la table UserFollows par lots de FETCH_SIZE lignes
+    """
+    using = using or router.db_for_read(UserFollows)
+    table = UserFollows._meta.db_table
+    chunks = []
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT user_id, followed_user_id FROM {table}")
+        while rows := cursor.fetchmany(FETCH_SIZE):
+            chunks.append(np.array(rows, dtype=np.int64).reshape(-1, 2))
+    edges = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+    return build_graph(edges[:, 0], edges[:, 1])
+
+
+def load_activity_weights(user_ids: np.ndarray, days: int) -> np.ndarray:
+    """
+    Retourne le poids d'activité de chaque utilisateur du graphe : 1 + log(1 + nombre de tickets et reviews publiés
+    sur les derniers jours)
+    """
+    since = timezone.now() - timedelta(days=days)
+    activity = np.zeros(len(user_ids), dtype=np.float64)
+    for model in (Ticket, Review):
+        counts = model.objects.filter(time_created__gte=since).order_by().values_list(
+            'user').annotate(count=Count('pk'))
+        for user_id, count in counts:
+            position = np.searchsorted(user_ids, user_id)
+            if position < len(user_ids) and user_ids[position] == user_id:
+                activity[position] += count
+    return 1.0 + np.log1p(activity)
+
+
+def gather_rows(graph: FollowGraphArrays, rows: np.ndarray, max_fanout: int) -> np.ndarray:
+    """
+    Retourne la concaténation des listes d'adjacence des lignes reçues, chacune tronquée à max_fanout indices
+    """
+    starts = graph.indptr[rows]
+    lengths = np.minimum(graph.indptr[rows + 1] - starts, max_fanout)
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return graph.indices[offsets + np.arange(total)]
+
+
+def rank_candidates(graph: FollowGraphArrays,
+                    weights: np.ndarray,
+                    row: int,
+                    top_k: int,
+                    max_fanout: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Retourne les indices, scores et nombres d'utilisateurs suivis en commun des top_k meilleurs candidats d'un
+    utilisateur, par score décroissant
+    """
+    followed = graph.indices[graph.indptr[row]:graph.indptr[row + 1]]
+    candidates, mutual_counts = np.unique(gather_rows(graph, followed, max_fanout), return_counts=True)
+    # Les listes d'adjacence sont triées : les utilisateurs déjà suivis sont retirés par recherche dichotomique
+    position = np.minimum(np.searchsorted(followed, candidates), max(len(followed) - 1, 0))
+    keep = candidates != row
+    if len(followed):
+        keep &= followed[position] != candidates
+    candidates, mutual_counts = candidates[keep], mutual_counts[keep]
+
+    scores = mutual_counts * weights[candidates]
+    if len(candidates) > top_k:
+        best = np.argpartition(-scores, top_k)[:top_k]
+        candidates, scores, mutual_counts = candidates[best], scores[best], mutual_counts[best]
+    order = np.argsort(-scores, kind='stable')
+    return candidates[order], scores[order], mutual_counts[order]
+
+
+# Données partagées avec les processus de calcul, héritées lors du fork
+_worker_state: dict = {}
+
+
+def _init_worker(graph: FollowGraphArrays, weights: np.ndarray, top_k: int, max_fanout: int) -> None:
+    _worker_state.update(graph=graph, weights=weights, top_k=top_k, max_fanout=max_fanout)
+
+
+def _rank_chunk(rows: range) -> list[tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    graph = _worker_state["graph"]
+    return [(row, *rank_candidates(graph, _worker_state["weights"], row,
+                                   _worker_state["top_k"], _worker_state["max_fanout"]))
+            for row in rows]
+
+
+def iter_suggestions(graph: FollowGraphArrays,
+                     weights: np.ndarray,
+                     top_k: int,
+                     max_fanout: int,
+                     workers: int | None = None,
+                     chunk_size: int = 1000) -> Iterator[list[tuple[int, np.ndarray, np.ndarray, np.ndarray]]]:
+    """
+    Calcule les suggestions de chaque utilisateur du graphe, par tranches de chunk_size utilisateurs réparties entre
+    workers processus (tous les cœurs par défaut)
+    """
+    chunks = [range(start, min(start + chunk_size, len(graph.user_ids)))
+              for start in range(0, len(graph.user_ids), chunk_size)]
+    if workers == 1:
+        _init_worker(graph, weights, top_k, max_fanout)
+        yield from map(_rank_chunk, chunks)
+        return
+
+    # Les connexions ouvertes ne doivent pas être partagées avec les processus fils
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(graph, weights, top_k, max_fanout)) as pool:
+        yield from pool.imap_unordered(_rank_chunk, chunks)
+
+
+def save_suggestions(graph: FollowGraphArrays,
+                     results: list[tuple[int, np.ndarray, np.ndarray, np.ndarray]],
+                     computed_at) -> int:
+    """
+    Remplace les suggestions enregistrées des utilisateurs d'une tranche, retourne le nombre de suggestions écrites
+    """
+    user_ids = graph.user_ids
+    suggestions = [
+        FollowSuggestion(user_id=int(user_ids[row]), suggested_user_id=int(user_ids[candidate]),
+                         score=float(score), mutual_count=int(mutual_count), time_computed=computed_at)
+        for row, candidates, scores, mutual_counts in results
+        for candidate, score, mutual_count in zip(candidates, scores, mutual_counts)]
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user__in=[int(user_ids[row]) for row, *_ in results]).delete()
+        FollowSuggestion.objects.bulk_create(suggestions, batch_size=settings.FOLLOW_SUGGESTIONS_BATCH_SIZE)
+    return len(suggestions)
+
+
+def compute_follow_suggestions(top_k: int | None = None,
+                               max_fanout: int | None = None,
+                               activity_days: int | None = None,
+                               workers: int | None = None,
+                               chunk_size: int = 1000) -> tuple[int, int]:
+    """
+    Recalcule et enregistre les suggestions d'abonnement de l'ensemble des utilisateurs
+
+    Les suggestions des utilisateurs ne suivant plus personne sont supprimées. Retourne le nombre d'utilisateurs
+    traités et le nombre de suggestions écrites.
+    """
+    computed_at = timezone.now()
+    graph = load_graph()
+    weights = load_activity_weights(graph.user_ids, activity_days or settings.FOLLOW_SUGGESTIONS_ACTIVITY_DAYS)
+
+    written = 0
+    for results in iter_suggestions(graph, weights,
+                                    top_k or settings.FOLLOW_SUGGESTIONS_TOP_K,
+                                    max_fanout or settings.FOLLOW_SUGGESTIONS_MAX_FANOUT,
+                                    workers, chunk_size):
+        written += save_suggestions(graph, results, computed_at)
+    FollowSuggestion.objects.filter(time_computed__lt=computed_at).delete()
+    return len(graph.user_ids), written
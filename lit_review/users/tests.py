@@ -0,0 +1,233 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from feed import cache as feed_cache
+from feed.models import FeedEntry, Ticket
+from .auth import _user_key, get_cache
+from .autocomplete import UsernameIndex
+from .bulk import ALREADY_FOLLOWED, FOLLOWED, NOT_FOLLOWED, SELF, UNFOLLOWED, UNKNOWN, bulk_follow
+from .follow_graph import follow_graph
+from .models import FollowSuggestion, UserFollows
+from .suggestions import compute_follow_suggestions
+
+
+class CachedAuthenticationTests(TestCase):
+    """
+    Authentification des requêtes depuis le cache des sessions et de l'utilisateur authentifié (voir users.auth)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.assertTrue(self.client.login(username="reader", password="password"))
+        # Première requête : la session et l'utilisateur sont mis en cache
+        self.assertEqual(self.client.get(reverse("feed:home")).status_code, 200)
+
+    def get_home(self):
+        """
+        Retourne la réponse de la page d'accueil du feed et les tables d'authentification lues par la requête
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("feed:home"))
+        tables = {table for query in queries for table in ("django_session", "auth_user") if table in query["sql"]}
+        return response, tables
+
+    def test_cached_request_runs_no_auth_query(self):
+        response, tables = self.get_home()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], self.user)
+        self.assertEqual(tables, set())
+
+    def test_logout_invalidates_cached_user(self):
+        self.assertIsNotNone(get_cache().get(_user_key(self.user.pk)))
+        self.client.get(reverse("users:logout"))
+        self.assertIsNone(get_cache().get(_user_key(self.user.pk)))
+
+        response, _ = self.get_home()
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_invalidates_cached_user(self):
+        self.user.set_password("new password")
+        self.user.save()
+        self.assertIsNone(get_cache().get(_user_key(self.user.pk)))
+
+        # La session, ouverte avec l'ancien mot de passe, n'est plus valide
+        response, tables = self.get_home()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("auth_user", tables)
+
+
+class UsernameIndexTests(TestCase):
+    """
+    Actualisation de l'index d'autocomplétion des noms d'utilisateur (voir users.autocomplete)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=username) for username in ("alice", "Albert", "bob")])
+
+    def test_refresh_adds_new_users(self):
+        index = UsernameIndex()
+        index.refresh()
+        self.assertEqual(index.complete("al", 10), ["Albert", "alice"])
+
+        User.objects.bulk_create([User(username="alain")])
+        with override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0):
+            index.refresh()
+        self.assertEqual(index.complete("al", 10), ["alain", "Albert", "alice"])
+
+    def test_rebuild_drops_renamed_and_deleted_users(self):
+        index = UsernameIndex()
+        index.refresh()
+        # Modifications sans signal, comme si elles étaient traitées par un autre processus
+        User.objects.filter(username="alice").update(username="carol")
+        User.objects.filter(username="bob").delete()
+
+        with override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0):
+            index.refresh()
+            self.assertEqual(index.complete("", 10), ["Albert", "alice", "bob"])
+            with override_settings(AUTOCOMPLETE_REBUILD_INTERVAL=0):
+                index.refresh()
+        self.assertEqual(index.complete("", 10), ["Albert", "carol"])
+
+
+class FollowGraphTests(TestCase):
+    """
+    Graphe des abonnements en mémoire (voir users.follow_graph)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.followed, cls.other = User.objects.bulk_create([User(username="followed"), User(username="other")])
+
+    def setUp(self):
+        follow_graph.clear()
+
+    def test_follows_are_applied_on_commit(self):
+        snapshot = follow_graph.followed(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            follow = UserFollows.objects.create(user=self.user, followed_user=self.followed)
+            self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [])
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [self.followed.pk])
+        self.assertEqual(follow_graph.followers(self.followed.pk).tolist(), [self.user.pk])
+        # Un tableau retourné n'est pas modifié par les mises à jour ultérieures
+        self.assertEqual(snapshot.tolist(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [])
+
+    def test_rolled_back_bulk_follow_leaves_no_edge(self):
+        follow_graph.followed(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                bulk_follow(self.user, ["followed", "other"])
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [])
+
+
+class FollowSuggestionTests(TestCase):
+    """
+    Calcul des suggestions d'abonnement (voir users.suggestions)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.a, cls.b, cls.c, cls.d, cls.e = User.objects.bulk_create(
+            [User(username=username) for username in ("reader", "a", "b", "c", "d", "e")])
+        UserFollows.objects.bulk_create([
+            UserFollows(user=follower, followed_user=followed)
+            for follower, followed in ((cls.user, cls.a), (cls.user, cls.b),
+                                       (cls.a, cls.c), (cls.a, cls.d), (cls.a, cls.user),
+                                       (cls.b, cls.c), (cls.b, cls.e), (cls.b, cls.a))])
+        # Utilisateur actif : classé devant un candidat inactif ayant autant d'utilisateurs suivis en commun
+        Ticket.objects.create(title="Livre", description="description", user=cls.e)
+
+    def test_candidates_are_ranked_and_filtered(self):
+        compute_follow_suggestions(workers=1)
+        suggestions = list(FollowSuggestion.objects.filter(user=self.user).order_by('-score').values_list(
+            'suggested_user', 'mutual_count'))
+        # L'utilisateur lui-même et les utilisateurs déjà suivis (a, b) sont exclus
+        self.assertEqual(suggestions, [(self.c.pk, 2), (self.e.pk, 1), (self.d.pk, 1)])
+
+    def test_suggestions_are_limited_to_top_k(self):
+        compute_follow_suggestions(top_k=1, workers=1)
+        suggestions = FollowSuggestion.objects.filter(user=self.user).values_list('suggested_user', flat=True)
+        self.assertEqual(list(suggestions), [self.c.pk])
+
+
+class BulkFollowTests(TestCase):
+    """
+    Abonnements et désabonnements en masse (voir users.bulk)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.followed, cls.author, cls.other = User.objects.bulk_create(
+            [User(username=username) for username in ("followed", "author", "other")])
+        UserFollows.objects.create(user=cls.user, followed_user=cls.followed)
+        Ticket.objects.create(title="Livre", description="description", user=cls.author)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        follow_graph.clear()
+        self.client.force_login(self.user)
+
+    def post(self, name: str, usernames) -> tuple[int, dict]:
+        response = self.client.post(reverse(name), json.dumps({"usernames": usernames}),
+                                    content_type="application/json")
+        return response.status_code, response.json()
+
+    @override_settings(FEED_TIMELINE_MODE=True)
+    def test_bulk_follow_reports_each_name_and_updates_follows(self):
+        self.assertEqual(self.client.get(reverse("feed:home")).status_code, 200)
+        version = feed_cache.get_cache().get(feed_cache._version_key(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status, data = self.post("users:bulk_follow", ["author", " author ", "followed", "nobody", "reader", ""])
+        self.assertEqual(status, 200)
+        self.assertEqual(data["results"], {"author": FOLLOWED, "followed": ALREADY_FOLLOWED, "nobody": UNKNOWN,
+                                           "reader": SELF})
+        self.assertEqual(data["counts"], {FOLLOWED: 1, ALREADY_FOLLOWED: 1, UNKNOWN: 1, SELF: 1})
+        self.assertTrue(UserFollows.objects.filter(user=self.user, followed_user=self.author).exists())
+
+        # Receveurs du signal follows_bulk_created : graphe des abonnements, feed en cache et timeline
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [self.followed.pk, self.author.pk])
+        self.assertNotEqual(feed_cache.get_cache().get(feed_cache._version_key(self.user.pk)), version)
+        self.assertEqual(list(FeedEntry.objects.filter(owner=self.user).values_list('object_id', flat=True)),
+                         list(Ticket.objects.filter(user=self.author).values_list('pk', flat=True)))
+
+    def test_bulk_unfollow_reports_each_name(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            status, data = self.post("users:bulk_unfollow", ["followed", "author", "nobody", "reader"])
+        self.assertEqual(status, 200)
+        self.assertEqual(data["results"], {"followed": UNFOLLOWED, "author": NOT_FOLLOWED, "nobody": UNKNOWN,
+                                           "reader": SELF})
+        self.assertFalse(UserFollows.objects.filter(user=self.user).exists())
+        self.assertEqual(follow_graph.followed(self.user.pk).tolist(), [])
+
+    @override_settings(BULK_FOLLOW_MAX_USERNAMES=2)
+    def test_usernames_are_capped(self):
+        status, data = self.post("users:bulk_follow", ["author", "other", "nobody"])
+        self.assertEqual(status, 400)
+        self.assertIn("error", data)
+        self.assertEqual(UserFollows.objects.filter(user=self.user).count(), 1)
+
+    def test_invalid_body_is_rejected(self):
+        for usernames in ("author", [1, 2], None):
+            with self.subTest(usernames=usernames):
+                self.assertEqual(self.post("users:bulk_follow", usernames)[0], 400)
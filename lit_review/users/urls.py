@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.urls import path
+
 from . import views
 
 
@@ -8,7 +10,10 @@ urlpatterns = [
     path("registration/", views.user_registration_request, name="register_user"),
     path("authentication_page/", views.authentication_request, name="authentication_page"),
     path("logout/", views.logout_user, name="logout"),
-    path("follow/", views.render_user_follow, name="follow"),
+    path("follow/", views.arender_user_follow if settings.ASYNC_VIEWS else views.render_user_follow, name="follow"),
+    path("follow/autocomplete/", views.autocomplete_username, name="autocomplete"),
+    path("follow/bulk/", views.bulk_follow_users, name="bulk_follow"),
+    path("unfollow/bulk/", views.bulk_unfollow_users, name="bulk_unfollow"),
     path("unfollow/<int:user_id>", views.unfollow_user, name="follow"),
 
 ]
@@ -1,3 +1,9 @@
+import asyncio
+import json
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
@@ -5,10 +11,16 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
 from django.db.models import Value, BooleanField, QuerySet
-from django.http import HttpRequest
+from django.http import HttpRequest, JsonResponse
 from django.shortcuts import render, redirect
-
-from .models import UserFollows
+from django.views.decorators.http import require_POST
+
+from feed.pagination import alist
+from .autocomplete import complete_username
+from .bulk import bulk_follow, bulk_unfollow
+from .decorators import async_login_required
+from .follow_graph import get_followed_id, get_followers_id
+from .models import UserFollows, FollowSuggestion
 from .forms import UserSearchInput, RegistrationForm, UserAuthenticationForm
 
 
@@ -17,7 +29,7 @@ def get_user_followed(user_id: int) -> QuerySet[User, ...]:
     Reçoit un user_id (user__pk) et en retourne tous les utilisateurs étant suivis par
     l'utilisateur authentifié
     """
-    return User.objects.filter(pk__in=UserFollows.objects.filter(user=user_id).values("followed_user"))
+    return User.objects.filter(pk__in=get_followed_id(user_id))
 
 
 def get_following_user(user_id: int) -> QuerySet[User, ...]:
@@ -25,7 +37,19 @@ def get_following_user(user_id: int) -> QuerySet[User, ...]:
     Reçoit un user_id (user__pk) et en retourne tous les utilisateurs étant abonnés à
     l'utilisateur authentifié
     """
-    return User.objects.filter(pk__in=UserFollows.objects.filter(followed_user=user_id).values("user"))
+    return User.objects.filter(pk__in=get_followers_id(user_id))
+
+
+def get_follow_suggestions(user_id: int) -> list[User]:
+    """
+    Reçoit un user_id (user__pk) et retourne les utilisateurs suggérés à l'utilisateur authentifié, par score
+    décroissant
+
+    Les utilisateurs suivis depuis le dernier calcul des suggestions sont écartés.
+    """
+    suggestions = FollowSuggestion.objects.filter(user=user_id).exclude(
+        suggested_user__in=get_followed_id(user_id)).select_related('suggested_user').order_by('-score')
+    return [suggestion.suggested_user for suggestion in suggestions[:settings.FOLLOW_SUGGESTIONS_DISPLAYED]]
 
 
 def post_authentication_request(request: HttpRequest) -> HttpRequest:
@@ -164,7 +188,8 @@ def render_user_follow(request: HttpRequest) -> HttpRequest:
 
     Instancie un formulaire d'abonnement à un utilisateur,
     récupère la liste des utilisateurs auxquels l'utilisateur authentifié est abonné,
-    récupère la liste d'utilisateurs étant abonnés à l'utilisateur authentifié.
+    récupère la liste d'utilisateurs étant abonnés à l'utilisateur authentifié,
+    récupère les suggestions d'abonnement de l'utilisateur authentifié.
 
     Transmet le formulaire et les listes d'utilisateurs au contexte de la page de gestion des abonnements.
     """
@@ -178,11 +203,111 @@ def render_user_follow(request: HttpRequest) -> HttpRequest:
 
     following_users = get_following_user(request.user.pk)
 
+    suggested_users = get_follow_suggestions(request.user.pk)
+
     return render(request,
                   "users/follow_page.html",
                   context={"search_user_input": search_user_input,
                            "followed": followed_users,
-                           "following": following_users})
+                           "following": following_users,
+                           "suggested": suggested_users})
+
+
+@async_login_required
+async def arender_user_follow(request: HttpRequest) -> HttpRequest:
+    """
+    Version asynchrone de render_user_follow, utilisée lorsque settings.ASYNC_VIEWS est vrai
+
+    Les abonnements, les abonnés et les suggestions d'abonnement de l'utilisateur sont lus simultanément.
+    """
+    if request.method == 'POST':
+        return await sync_to_async(post_user_follow)(request)
+    search_user_input = UserSearchInput()
+
+    # Les identifiants des utilisateurs sont lus depuis le graphe d'abonnements, chargé au besoin depuis la base
+    followed_users, following_users = await sync_to_async(
+        lambda: (get_user_followed(request.user.pk), get_following_user(request.user.pk)))()
+    followed_users = followed_users.annotate(is_followed=Value(True, BooleanField()))
+
+    followed_users, following_users, suggested_users = await asyncio.gather(
+        alist(followed_users),
+        alist(following_users),
+        sync_to_async(get_follow_suggestions)(request.user.pk))
+
+    return await sync_to_async(render)(request,
+                                       "users/follow_page.html",
+                                       context={"search_user_input": search_user_input,
+                                                "followed": followed_users,
+                                                "following": following_users,
+                                                "suggested": suggested_users})
+
+
+@login_required
+def autocomplete_username(request: HttpRequest) -> JsonResponse:
+    """
+    Permet l'autocomplétion du nom d'utilisateur dans le formulaire d'abonnement
+
+    Reçoit une requête contenant le début d'un nom d'utilisateur "q" et retourne les noms d'utilisateur
+    correspondants, à l'exception de celui de l'utilisateur authentifié.
+    """
+    prefix = request.GET.get("q", "").strip()
+    usernames = []
+    if prefix:
+        usernames = [username for username in complete_username(prefix, settings.AUTOCOMPLETE_LIMIT + 1)
+                     if username != request.user.username][:settings.AUTOCOMPLETE_LIMIT]
+    return JsonResponse({"usernames": usernames})
+
+
+def get_bulk_usernames(request: HttpRequest) -> list[str] | None:
+    """
+    Retourne la liste de noms d'utilisateur "usernames" du corps JSON de la requête, ou None si elle est invalide
+    """
+    try:
+        usernames = json.loads(request.body).get("usernames")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(usernames, list) or not all(isinstance(username, str) for username in usernames):
+        return None
+    return usernames
+
+
+def bulk_follow_response(request: HttpRequest, action) -> JsonResponse:
+    """
+    Applique l'action d'abonnement en masse aux noms d'utilisateur de la requête et retourne le résultat obtenu pour
+    chaque nom ainsi que le nombre de noms par résultat
+    """
+    usernames = get_bulk_usernames(request)
+    if usernames is None:
+        return JsonResponse({"error": "Le corps de la requête doit contenir une liste \"usernames\""}, status=400)
+    if len(usernames) > settings.BULK_FOLLOW_MAX_USERNAMES:
+        return JsonResponse({"error": f"Au plus {settings.BULK_FOLLOW_MAX_USERNAMES} noms d'utilisateur par requête"},
+                            status=400)
+    results = action(request.user, usernames)
+    return JsonResponse({"results": results, "counts": Counter(results.values())})
+
+
+@login_required
+@require_POST
+def bulk_follow_users(request: HttpRequest) -> JsonResponse:
+    """
+    Permet à l'utilisateur authentifié de s'abonner en une requête à une liste d'utilisateurs
+
+    Reçoit une requête POST dont le corps JSON contient la liste "usernames" d'au plus BULK_FOLLOW_MAX_USERNAMES noms
+    d'utilisateur et retourne le résultat obtenu pour chaque nom (voir users.bulk).
+    """
+    return bulk_follow_response(request, bulk_follow)
+
+
+@login_required
+@require_POST
+def bulk_unfollow_users(request: HttpRequest) -> JsonResponse:
+    """
+    Permet à l'utilisateur authentifié de se désabonner en une requête d'une liste d'utilisateurs
+
+    Reçoit une requête POST dont le corps JSON contient la liste "usernames" d'au plus BULK_FOLLOW_MAX_USERNAMES noms
+    d'utilisateur et retourne le résultat obtenu pour chaque nom (voir users.bulk).
+    """
+    return bulk_follow_response(request, bulk_unfollow)
 
 
 @login_required